@@ -0,0 +1,217 @@
+"""
+Module containing the bot's move search.
+Scores every placement of the current piece by the best position it
+leads to after the known upcoming pieces, using a board evaluation of
+height, holes, bumpiness and cleared lines.
+
+SearchPool spreads the root placements over a process pool. The board
+goes to the workers through a shared-memory buffer instead of being
+pickled with every task, and the chosen move does not depend on the
+number of workers.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from tetris_board import Board
+from tetris_constants import COLS, ROWS
+from tetris_perft import PIECES, placements
+
+# Evaluation weights (per column of aggregate height, line, hole and unit of bumpiness)
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+# Root placements handed to a worker per task
+SEARCH_CHUNK_SIZE = 2
+
+# Score of a root that leads only to game over
+LOST = float("-inf")
+
+
+def evaluate(board, lines):
+    """
+    Score a board position; higher is better.
+
+    Args:
+        board: Board after the placements
+        lines: Lines the placements cleared
+
+    Returns:
+        float: The score
+    """
+    cells = board.cells
+    heights = []
+    holes = 0
+    for x in range(COLS):
+        height = 0
+        for y in range(ROWS):
+            if cells[y * COLS + x]:
+                if not height:
+                    height = ROWS - y
+            elif height:
+                holes += 1
+        heights.append(height)
+    bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(COLS - 1))
+    return (HEIGHT_WEIGHT * sum(heights) + LINES_WEIGHT * lines
+            + HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+def search(board, pieces, lines=0):
+    """
+    Find the best score reachable by placing pieces in order.
+
+    Args:
+        board: Board to search from (left unchanged)
+        pieces: Piece types still to place
+        lines: Lines already cleared on the way here
+
+    Returns:
+        float: Best evaluation after placing every piece, or LOST
+    """
+    if not pieces:
+        return evaluate(board, lines)
+    cells = board.cells
+    saved = bytes(cells)
+    cleared = board.lines_cleared
+    best = LOST
+    for piece, x, y in placements(board, pieces[0]):
+        board.place_piece(piece, x, y)
+        count = board.check_lines(y, y + len(piece.shape) - 1)
+        best = max(best, search(board, pieces[1:], lines + count))
+        cells[:] = saved
+    board.lines_cleared = cleared
+    board.mark_dirty()
+    return best
+
+
+def score_root(board, pieces, move):
+    """
+    Score one root placement by the best position it leads to.
+
+    Args:
+        board: Board to search from (left unchanged)
+        pieces: Piece types; the first is the one being placed
+        move: (piece type, rotation, x, y) of the root placement
+
+    Returns:
+        float: The score
+    """
+    piece_type, rotation, x, y = move
+    piece = PIECES[piece_type][rotation]
+    saved = bytes(board.cells)
+    cleared = board.lines_cleared
+    board.place_piece(piece, x, y)
+    lines = board.check_lines(y, y + len(piece.shape) - 1)
+    score = search(board, pieces[1:], lines)
+    board.cells[:] = saved
+    board.lines_cleared = cleared
+    board.mark_dirty()
+    return score
+
+
+def root_moves(board, piece_type):
+    """Return the root placements of a piece as (type, rotation, x, y) tuples."""
+    return [(piece_type, piece.rotation, x, y) for piece, x, y in placements(board, piece_type)]
+
+
+def pick(moves, scores):
+    """Return the best move, preferring the earliest on ties, or None if there are none."""
+    best = None
+    best_score = None
+    for move, score in zip(moves, scores):
+        if best_score is None or score > best_score:
+            best, best_score = move, score
+    return best
+
+
+def best_move(board, pieces):
+    """
+    Find the best placement for the first piece, in this process.
+
+    Args:
+        board: Board to search from (left unchanged)
+        pieces: Piece types to look ahead over; the first is placed
+
+    Returns:
+        tuple: (piece type, rotation, x, y), or None if the piece cannot spawn
+    """
+    moves = root_moves(board, pieces[0])
+    return pick(moves, [score_root(board, pieces, move) for move in moves])
+
+
+# Worker process state, set up by attach_worker
+worker_buffer = None
+worker_board = None
+
+
+def attach_worker(buffer):
+    """Keep the shared board buffer in a worker process."""
+    global worker_buffer, worker_board
+    worker_buffer = buffer
+    worker_board = Board()
+
+
+def score_shared(pieces, move):
+    """Score a root placement against the board in the shared buffer."""
+    worker_board.cells[:] = memoryview(worker_buffer).cast("B")
+    worker_board.lines_cleared = 0
+    worker_board.mark_dirty()
+    return score_root(worker_board, pieces, move)
+
+
+class SearchPool:
+    """
+    Root-parallel move search over a process pool.
+
+    Each search copies the board into a shared buffer once; tasks carry
+    only the piece list and a root placement. Root scores come back in
+    submission order and ties go to the earliest root, so the result is
+    the same as best_move() for any number of workers.
+    """
+
+    def __init__(self, workers=None, chunk_size=SEARCH_CHUNK_SIZE, context=None):
+        """
+        Initialize the pool.
+
+        Args:
+            workers: Number of worker processes (default: one per CPU)
+            chunk_size: Root placements per task
+            context: multiprocessing context (default: the platform default)
+        """
+        context = context or multiprocessing.get_context()
+        self.buffer = context.RawArray("B", ROWS * COLS)
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=context, initializer=attach_worker, initargs=(self.buffer,),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut the worker processes down."""
+        self.executor.shutdown()
+
+    def best_move(self, board, pieces):
+        """
+        Find the best placement for the first piece using the workers.
+
+        Args:
+            board: Board to search from
+            pieces: Piece types to look ahead over; the first is placed
+
+        Returns:
+            tuple: (piece type, rotation, x, y), or None if the piece cannot spawn
+        """
+        moves = root_moves(board, pieces[0])
+        if not moves:
+            return None
+        memoryview(self.buffer).cast("B")[:] = board.cells
+        pieces = list(pieces)
+        scores = self.executor.map(score_shared, [pieces] * len(moves), moves, chunksize=self.chunk_size)
+        return pick(moves, scores)
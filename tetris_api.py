@@ -3,58 +3,469 @@ Module for handling API interactions with the Tetris server.
 Provides functions for fetching and saving high scores.
 """
 
-from js import fetch, console, window
+from js import fetch, console, window, AbortController, Object
+import asyncio
 import json
+import random
+import uuid
+import weakref
+from urllib.parse import urlencode
 from pyodide.ffi import to_js
 
+# localStorage key and default freshness for the cached leaderboard
+LEADERBOARD_CACHE_KEY = "tetris-leaderboard"
+LEADERBOARD_CACHE_TTL = 60 * 1000  # milliseconds
+
+# Seconds before an API request is aborted
+REQUEST_TIMEOUT = 10.0
+
+# Score submission queue settings
+SUBMISSION_QUEUE_KEY = "tetris-pending-scores"
+SUBMISSION_BATCH_SIZE = 20
+SUBMISSION_FLUSH_INTERVAL = 5.0  # seconds between flushes
+SUBMISSION_RETRY_BASE = 1.0  # seconds before the first retry
+SUBMISSION_RETRY_MAX = 60.0  # longest wait between retries
+
+# localStorage key for scores the server permanently rejected, and how many are kept
+SUBMISSION_REJECTED_KEY = "tetris-rejected-scores"
+SUBMISSION_REJECTED_MAX = 50
+
+
+def is_permanent_rejection(status):
+    """Return True for HTTP statuses that retrying the same request cannot fix."""
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+class ScorePage(list):
+    """
+    A list of scores as returned by GET /api/scores.
+    
+    Attributes:
+        next_cursor: Cursor of the following page, or None on the last page
+        paginated: False if the server ignored the paging parameters and
+            returned its whole leaderboard
+    """
+    
+    def __init__(self, scores=(), next_cursor=None, paginated=False):
+        super().__init__(scores)
+        self.next_cursor = next_cursor
+        self.paginated = paginated
+
+def parse_scores(data):
+    """
+    Convert a decoded /api/scores response into a ScorePage.
+    
+    Args:
+        data: Decoded JSON: a list, or {"highScores": [...], "nextCursor": ...}
+        
+    Returns:
+        ScorePage: The scores, or None if the data has an unknown format
+    """
+    if isinstance(data, list):
+        return ScorePage(data)
+    elif isinstance(data, dict) and "highScores" in data and isinstance(data["highScores"], list):
+        return ScorePage(data["highScores"], data.get("nextCursor"), "nextCursor" in data)
+    return None
+
+class LeaderboardCache:
+    """
+    Keeps the last leaderboard response in localStorage with its ETag.
+    
+    Cached scores can be shown immediately on page load; once the entry is
+    older than the TTL it is revalidated with a conditional request, which
+    costs a 304 with no body when nothing changed.
+    """
+    
+    def __init__(self, key=LEADERBOARD_CACHE_KEY, ttl=LEADERBOARD_CACHE_TTL):
+        """
+        Initialize the cache.
+        
+        Args:
+            key: localStorage key to persist the entry under
+            ttl: Milliseconds a cached entry is used without revalidating
+        """
+        self.key = key
+        self.ttl = ttl
+        self.entry = None
+        self.loaded = False
+    
+    def load(self):
+        """
+        Get the cached entry, reading localStorage on first use.
+        
+        Returns:
+            dict: {"etag", "stored_at", "data"} or None if nothing is cached
+        """
+        if not self.loaded:
+            self.loaded = True
+            try:
+                raw = window.localStorage.getItem(self.key)
+                if raw:
+                    self.entry = json.loads(raw)
+            except Exception as e:
+                console.error(f"Error reading cached scores: {str(e)}")
+        return self.entry
+    
+    @property
+    def etag(self):
+        """ETag of the cached leaderboard, or None."""
+        entry = self.load()
+        return entry.get("etag") if entry else None
+    
+    @property
+    def scores(self):
+        """Cached ScorePage, or None if nothing is cached."""
+        entry = self.load()
+        return parse_scores(entry.get("data")) if entry else None
+    
+    def is_fresh(self):
+        """Return True if the cached entry is younger than the TTL."""
+        entry = self.load()
+        return bool(entry) and window.Date.now() - entry.get("stored_at", 0) < self.ttl
+    
+    def store(self, data, etag):
+        """
+        Replace the cached entry.
+        
+        Args:
+            data: Decoded /api/scores response
+            etag: ETag the server sent with it
+        """
+        self.entry = {"etag": etag, "stored_at": window.Date.now(), "data": data}
+        self.persist()
+    
+    def touch(self):
+        """Mark the cached entry as fresh after a 304 response."""
+        if self.load():
+            self.entry["stored_at"] = window.Date.now()
+            self.persist()
+    
+    def invalidate(self):
+        """Force the next read to revalidate, keeping the entry for display."""
+        if self.load():
+            self.entry["stored_at"] = 0
+            self.persist()
+    
+    def persist(self):
+        """Write the entry to localStorage."""
+        try:
+            window.localStorage.setItem(self.key, json.dumps(self.entry))
+        except Exception as e:
+            console.error(f"Error caching scores: {str(e)}")
+
 class TetrisAPI:
     """
     Handles API interactions with the Tetris server.
     """
     
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, cache=None):
         """
         Initialize the API handler.
         
         Args:
             base_url: Base URL for API endpoints (default: current domain)
+            cache: LeaderboardCache to use (default: a localStorage-backed cache)
         """
         self.base_url = base_url or window.location.origin
+        self.cache = cache or LeaderboardCache()
+        self.caches = {"": self.cache}
+        
+        # Single-flight state: one in-flight task per resource key
+        self.in_flight = {}
+        self.controllers = {}
+        self.successors = weakref.WeakKeyDictionary()
+        
+        # Seconds the server asked submissions to wait, after a 429 or 503
+        self.retry_after = None
+        # HTTP status of the last score submission, or None if it was not answered
+        self.last_status = None
         console.log(f"TetrisAPI initialized with base URL: {self.base_url}")
     
-    async def get_scores(self):
+    @staticmethod
+    def scores_query(limit=None, cursor=None, sort=None, direction=None, since=None, until=None, window=None,
+                     view=None):
+        """
+        Build the /api/scores query string for a page request.
+        
+        Returns:
+            str: Query string, empty for the plain leaderboard request
+        """
+        params = {"limit": limit, "sort": sort, "direction": direction, "cursor": cursor,
+                  "since": since, "until": until, "window": window, "view": view}
+        return urlencode({name: value for name, value in params.items() if value is not None})
+    
+    def cache_for(self, query):
+        """
+        Get the cache holding responses for a query.
+        
+        Args:
+            query: Query string from scores_query
+            
+        Returns:
+            LeaderboardCache: The cache for that query
+        """
+        cache = self.caches.get(query)
+        if cache is None:
+            cache = self.caches[query] = LeaderboardCache(f"{self.cache.key}?{query}", self.cache.ttl)
+        return cache
+    
+    def get_cached_scores(self, limit=None, sort=None, direction=None):
+        """
+        Get the cached high scores without touching the network.
+        
+        Args:
+            limit: Page size of the cached first page (default: whole leaderboard)
+            sort: Column the page is sorted by
+            direction: Sort direction (asc, desc)
+        
+        Returns:
+            ScorePage: Cached high score objects, or None if nothing is cached
+        """
+        return self.cache_for(self.scores_query(limit, None, sort, direction)).scores
+    
+    async def request(self, key, url, options=None, timeout=REQUEST_TIMEOUT):
+        """
+        Fetch a URL with an abort signal and a timeout.
+        
+        The request is aborted when it times out or the awaiting task is cancelled.
+        
+        Args:
+            key: Resource key the request can be aborted by
+            url: URL to fetch
+            options: fetch() options
+            timeout: Seconds before the request is aborted
+            
+        Returns:
+            The fetch Response
+        """
+        controller = AbortController.new()
+        self.controllers[key] = controller
+        # fetch() only reads plain JS objects; a dict would arrive as a PyProxy
+        # and its headers, method, body and signal would be ignored
+        init = to_js({**(options or {}), "signal": controller.signal}, dict_converter=Object.fromEntries)
+        try:
+            return await asyncio.wait_for(fetch(url, init), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # wait_for only drops the Python await; the signal stops the network request
+            controller.abort()
+            raise
+        finally:
+            if self.controllers.get(key) is controller:
+                del self.controllers[key]
+    
+    def abort(self, key):
+        """
+        Abort the in-flight request for a resource, if any.
+        
+        Args:
+            key: Resource key of the request
+        """
+        controller = self.controllers.pop(key, None)
+        if controller is not None:
+            controller.abort()
+    
+    async def single_flight(self, key, factory, supersede=False):
+        """
+        Run a request once for all concurrent callers of the same resource.
+        
+        Callers that arrive while a request for the key is in flight wait
+        for its result instead of issuing their own. A superseding call
+        aborts the in-flight request and starts a new one; callers waiting
+        on the old request receive the new result.
+        
+        Args:
+            key: Resource key
+            factory: Function returning the coroutine that performs the request
+            supersede: Abort any in-flight request and start a fresh one
+            
+        Returns:
+            The request's result
+        """
+        task = self.in_flight.get(key)
+        if task is None or task.done() or supersede:
+            previous = task
+            task = asyncio.ensure_future(factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.in_flight.pop(key) if self.in_flight.get(key) is done else None)
+            if previous is not None and not previous.done():
+                self.successors[previous] = task
+                self.abort(key)
+        
+        while True:
+            # Shield so one caller giving up does not cancel the shared request
+            result = await asyncio.shield(task)
+            successor = self.successors.get(task)
+            if successor is None:
+                return result
+            task = successor
+    
+    async def get_scores(self, limit=None, cursor=None, sort=None, direction=None, force=False,
+                         since=None, until=None, window=None, view=None):
         """
         Fetch high scores from the server.
         
+        Without arguments this returns the server's whole leaderboard.
+        With a limit it returns one page sorted by the given column, and
+        the page's next_cursor fetches the following one; servers that do
+        not paginate return everything with paginated set to False.
+        
+        First pages are cached: a copy younger than the cache TTL is
+        returned as-is, older copies are revalidated with If-None-Match
+        and kept on a 304 or when the request fails. Concurrent calls for
+        the same page share a single request; a forced call supersedes
+        one that is already in flight.
+        
+        Args:
+            limit: Page size (default: whole leaderboard)
+            cursor: next_cursor of the previous page
+            sort: Column to sort by (name, score, level, lines, date)
+            direction: Sort direction (asc, desc)
+            force: Revalidate even if the cached copy is fresh
+            since: Only scores from this date on (epoch seconds or ISO date)
+            until: Only scores up to this date (epoch seconds or ISO date)
+            window: Best scores of the last "day" or "week" (or "all")
+            view: "players" for each player's best score only
+        
         Returns:
-            list: List of high score objects
+            ScorePage: List of high score objects
         """
+        query = self.scores_query(limit, cursor, sort, direction, since, until, window, view)
+        cache = self.cache_for(query) if cursor is None else None
+        if cache is not None and not force and cache.scores is not None and cache.is_fresh():
+            return cache.scores
+        
+        return await self.single_flight(
+            f"GET /api/scores?{query}",
+            lambda: self.fetch_scores(query, cache),
+            supersede=force,
+        )
+    
+    async def fetch_scores(self, query="", cache=None):
+        """
+        Request the leaderboard, revalidating the cached copy.
+        
+        Args:
+            query: Query string from scores_query
+            cache: LeaderboardCache to revalidate and update, or None
+        
+        Returns:
+            ScorePage: List of high score objects
+        """
+        cached = cache.scores if cache is not None else None
         try:
             api_url = f"{self.base_url}/api/scores"
+            if query:
+                api_url = f"{api_url}?{query}"
             console.log(f"Fetching scores from: {api_url}")
             
-            response = await fetch(api_url)
+            headers = {}
+            if cached is not None and cache.etag:
+                headers["If-None-Match"] = cache.etag
             
-            if response.ok:
-                data = await response.json()
-                console.log(f"Received high scores data: {json.dumps(data)[:100]}...")
+            response = await self.request(f"GET /api/scores?{query}", api_url, {"headers": headers})
+            
+            if response.status == 304:
+                console.log("Cached scores are up to date")
+                cache.touch()
+                return cached
+            elif response.ok:
+                data = json.loads(await response.text())
                 
                 # Handle different response formats
-                if isinstance(data, list):
-                    console.log(f"Loaded {len(data)} scores (array format)")
-                    return data
-                elif isinstance(data, dict) and "highScores" in data and isinstance(data["highScores"], list):
-                    console.log(f"Loaded {len(data['highScores'])} scores (object format)")
-                    return data["highScores"]
-                else:
+                scores = parse_scores(data)
+                if scores is None:
                     console.error("Invalid high scores data format:", data)
-                    return []
+                    return cached or ScorePage()
+                
+                console.log(f"Loaded {len(scores)} scores")
+                if cache is not None:
+                    cache.store(data, response.headers.get("ETag"))
+                return scores
             else:
                 console.error(f"Error fetching scores: {response.status} {response.statusText}")
-                return []
+                return cached or ScorePage()
         except Exception as e:
             console.error(f"Exception fetching scores: {str(e)}")
-            return []
+            return cached or ScorePage()
+    
+    async def get_rank(self, score):
+        """
+        Get the leaderboard place a score has.
+        
+        Args:
+            score: Score value
+            
+        Returns:
+            int: 1 for the best score, or None if the server could not answer
+        """
+        key = f"GET /api/rank?score={int(score)}"
+        return await self.single_flight(key, lambda: self.fetch_rank(key, int(score)))
+    
+    async def fetch_rank(self, key, score):
+        """
+        Request the place a score has.
+        
+        Args:
+            key: Resource key of the request
+            score: Score value
+            
+        Returns:
+            int: The rank, or None on failure
+        """
+        try:
+            api_url = f"{self.base_url}/api/rank?score={score}"
+            response = await self.request(key, api_url)
+            
+            if response.ok:
+                data = json.loads(await response.text())
+                return data.get("rank")
+            else:
+                console.error(f"Error fetching rank: {response.status} {response.statusText}")
+                return None
+        except Exception as e:
+            console.error(f"Exception fetching rank: {str(e)}")
+            return None
+    
+    async def get_player(self, name, history=None):
+        """
+        Get a player's best score and latest games.
+        
+        Args:
+            name: Player name, matched case-insensitively by the server
+            history: Maximum number of recent games (default: all the server keeps)
+            
+        Returns:
+            dict: {"name", "best", "recent"}, or None if the server could not answer
+        """
+        params = {"name": name}
+        if history is not None:
+            params["history"] = history
+        key = f"GET /api/players?{urlencode(params)}"
+        return await self.single_flight(key, lambda: self.fetch_player(key, params))
+    
+    async def fetch_player(self, key, params):
+        """
+        Request a player's best score and latest games.
+        
+        Args:
+            key: Resource key of the request
+            params: Query parameters
+            
+        Returns:
+            dict: The player's scores, or None on failure
+        """
+        try:
+            api_url = f"{self.base_url}/api/players?{urlencode(params)}"
+            response = await self.request(key, api_url)
+            
+            if response.ok:
+                return json.loads(await response.text())
+            else:
+                console.error(f"Error fetching player: {response.status} {response.statusText}")
+                return None
+        except Exception as e:
+            console.error(f"Exception fetching player: {str(e)}")
+            return None
     
     async def save_score(self, score_data):
         """
@@ -76,16 +487,29 @@ class TetrisAPI:
             console.log(f"Score data: {json.dumps(score_data)}")
             
             # Send to server
-            response = await fetch(api_url, {
+            self.last_status = None
+            response = await self.request("POST /api/scores", api_url, {
                 "method": "POST",
                 "headers": {
                     "Content-Type": "application/json"
                 },
                 "body": json.dumps(score_data)
             })
+            self.last_status = response.status
+            
+            if response.status in (429, 503):
+                # Rate limited or shedding load; the server says when to retry
+                self.retry_after = float(response.headers.get("Retry-After") or 0) or None
+                console.warn(f"Score submission deferred: {response.status}, retry after {self.retry_after}s")
+                return False
             
             if response.ok:
                 console.log("Score saved successfully")
+                self.retry_after = None
+                
+                # The leaderboard changed; revalidate on the next read
+                for cache in self.caches.values():
+                    cache.invalidate()
                 return True
             else:
                 console.error(f"Error saving score: {response.status} {response.statusText}")
@@ -113,7 +537,7 @@ class TetrisAPI:
             api_url = f"{self.base_url}/api/test"
             console.log(f"Testing connection to: {api_url}")
             
-            response = await fetch(api_url)
+            response = await self.request("GET /api/test", api_url)
             
             if response.ok:
                 console.log("Server connection test successful")
@@ -124,3 +548,174 @@ class TetrisAPI:
         except Exception as e:
             console.error(f"Server connection test exception: {str(e)}")
             return False
+
+
+class ScoreSubmissionQueue:
+    """
+    Persistent write-behind queue for score submissions.
+    
+    Scores are stored in localStorage under a client-generated ID as soon
+    as they are queued, then sent in batches on an interval. Failed
+    batches are retried with exponential backoff and full jitter, so a
+    score survives a backend outage or a page reload, and a retry storm
+    does not hit the server in lockstep.
+    
+    A batch the server rejects outright (a 4xx other than 408 or 429) is
+    resent one score at a time, and scores rejected on their own are moved
+    to a separate localStorage list instead of blocking the queue.
+    """
+    
+    def __init__(self, api, key=SUBMISSION_QUEUE_KEY, batch_size=SUBMISSION_BATCH_SIZE,
+                 flush_interval=SUBMISSION_FLUSH_INTERVAL, retry_base=SUBMISSION_RETRY_BASE,
+                 retry_max=SUBMISSION_RETRY_MAX):
+        """
+        Initialize the queue.
+        
+        Args:
+            api: TetrisAPI used to send batches
+            key: localStorage key to persist pending scores under
+            batch_size: Maximum number of scores per request
+            flush_interval: Seconds between flushes while scores are pending
+            retry_base: Seconds before the first retry after a failure
+            retry_max: Upper bound on the wait between retries
+        """
+        self.api = api
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.pending = {}  # submission ID -> score, in queue order
+        self.suspects = set()  # IDs from a rejected batch, resent one at a time
+        self.failures = 0
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.load()
+    
+    def load(self):
+        """Restore scores left pending by a previous page load."""
+        try:
+            raw = window.localStorage.getItem(self.key)
+            if raw:
+                for score in json.loads(raw):
+                    self.pending[score["id"]] = score
+        except Exception as e:
+            console.error(f"Error reading pending scores: {str(e)}")
+    
+    def persist(self):
+        """Write the pending scores to localStorage."""
+        try:
+            window.localStorage.setItem(self.key, json.dumps(list(self.pending.values())))
+        except Exception as e:
+            console.error(f"Error saving pending scores: {str(e)}")
+    
+    def reject(self, score):
+        """
+        Move a score the server permanently rejected out of the queue.
+        
+        Args:
+            score: The rejected score
+        """
+        console.error(f"Score rejected by the server: {json.dumps(score)}")
+        self.pending.pop(score["id"], None)
+        self.suspects.discard(score["id"])
+        try:
+            rejected = json.loads(window.localStorage.getItem(SUBMISSION_REJECTED_KEY) or "[]")
+            rejected.append(score)
+            window.localStorage.setItem(SUBMISSION_REJECTED_KEY, json.dumps(rejected[-SUBMISSION_REJECTED_MAX:]))
+        except Exception as e:
+            console.error(f"Error saving rejected score: {str(e)}")
+    
+    def start(self):
+        """Start the background flush loop."""
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+        return self.task
+    
+    def stop(self):
+        """Stop the background flush loop; pending scores stay persisted."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+    
+    def enqueue(self, score):
+        """
+        Queue a score for submission.
+        
+        Args:
+            score: Score object; an "id" is added if it has none
+            
+        Returns:
+            str: The score's submission ID
+        """
+        score_id = score.get("id")
+        if not score_id:
+            score_id = score["id"] = str(uuid.uuid4())
+        
+        # Re-queuing the same submission is a no-op
+        if score_id not in self.pending:
+            self.pending[score_id] = score
+            self.persist()
+        
+        # A full batch is sent early, but never while backing off
+        if len(self.pending) >= self.batch_size and not self.failures:
+            self.wakeup.set()
+        return score_id
+    
+    def retry_delay(self):
+        """
+        Get the wait before the next retry: exponential backoff with full
+        jitter, but never sooner than the server's Retry-After.
+        """
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (self.failures - 1)))
+        return max(delay, self.api.retry_after or 0)
+    
+    async def flush(self):
+        """
+        Send pending scores in batches until the queue is empty or a batch fails.
+        
+        Permanently rejected scores are set aside (see reject) rather than
+        counted as failures, so they never hold up the scores behind them.
+        
+        Returns:
+            bool: True if everything pending was sent or set aside
+        """
+        while self.pending:
+            scores = list(self.pending.values())
+            size = 1 if scores[0]["id"] in self.suspects else self.batch_size
+            batch = scores[:size]
+            if await self.api.save_score(batch):
+                for score in batch:
+                    self.pending.pop(score["id"], None)
+                    self.suspects.discard(score["id"])
+            elif not is_permanent_rejection(self.api.last_status):
+                self.failures += 1
+                return False
+            elif len(batch) > 1:
+                # Find the bad scores by resending the batch one score at a time
+                self.suspects.update(score["id"] for score in batch)
+                continue
+            else:
+                self.reject(batch[0])
+            
+            self.failures = 0
+            self.persist()
+        return True
+    
+    async def run(self):
+        """Flush on an interval, backing off after failures."""
+        while True:
+            if self.failures:
+                delay = self.retry_delay()
+            else:
+                delay = self.flush_interval
+            
+            # Sleep until the delay passes or a full batch is waiting
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            
+            if self.pending:
+                await self.flush()
@@ -0,0 +1,397 @@
+"""
+Module containing the head-to-head battle server.
+Runs the authoritative rules for both players of every match in one
+asyncio process. Clients only send inputs; lines they clear are sent to
+the opponent as garbage.
+
+Protocol: newline-delimited JSON over TCP.
+    client -> server: {"type": "input", "action": "left"}
+    server -> client: {"type": "start", "match": id, "player": 0 or 1, "seed": seed}
+                      {"type": "state", "frame": n, "players": [...]}
+                      {"type": "end", "frame": n, "winner": 0, 1 or null}
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from collections import deque
+from functools import partial
+
+from tetris_constants import ATTACK_LINES
+from tetris_engine import TetrisEngine
+
+# Simulation steps per second
+TICK_RATE = 60
+
+# Inputs applied per player per tick; extra inputs wait for later ticks
+MAX_INPUTS_PER_TICK = 4
+
+# Inputs a player may have waiting before new ones are dropped
+MAX_PENDING_INPUTS = 32
+
+# Player input name -> engine call
+ACTIONS = {
+    "left": lambda engine: engine.move_left(),
+    "right": lambda engine: engine.move_right(),
+    "down": lambda engine: engine.move_down(),
+    "rotate": lambda engine: engine.rotate(True),
+    "rotate_ccw": lambda engine: engine.rotate(False),
+    "drop": lambda engine: engine.hard_drop(),
+}
+
+
+def is_action(action):
+    """Return True if an input names one of ACTIONS."""
+    return isinstance(action, str) and action in ACTIONS
+
+
+def valid_actions(actions):
+    """
+    Keep the known actions of one player's tick, at most MAX_INPUTS_PER_TICK.
+
+    Args:
+        actions: Actions as received, possibly from the network
+
+    Returns:
+        tuple: The actions step may apply
+    """
+    return tuple(action for action in actions if is_action(action))[:MAX_INPUTS_PER_TICK]
+
+
+class BattleMatch:
+    """
+    One match between two players, stepped in fixed ticks.
+
+    Both engines share a seed, so the players get the same pieces, while
+    each player's garbage holes come from a seed of their own. Each tick
+    applies the players' queued inputs, then gravity; every piece that
+    clears lines is worth ATTACK_LINES garbage for its own clear, which
+    first cancels garbage the clearing player has queued and then goes
+    to the opponent.
+    """
+
+    def __init__(self, match_id, seed, tick_rate=TICK_RATE):
+        """
+        Initialize the match.
+
+        Args:
+            match_id: Match identifier
+            seed: Seed for both players' pieces and, derived from it, their garbage
+            tick_rate: Ticks per second, for converting drop intervals
+        """
+        self.match_id = match_id
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.engines = [TetrisEngine(seed), TetrisEngine(seed)]
+        for player, engine in enumerate(self.engines):
+            engine.reset(seed)
+            engine.garbage_rng.seed(f"{seed}/garbage/{player}")
+            engine.on_lock = partial(self.attack, player)
+        self.inputs = [deque(), deque()]
+        self.gravity = [0, 0]
+        self.frame = 0
+        self.winner = None
+        self.over = False
+
+    def push_input(self, player, action):
+        """
+        Queue an input for the next tick.
+
+        Args:
+            player: 0 or 1
+            action: Name from ACTIONS
+
+        Returns:
+            bool: False if the input was unknown or the queue is full
+        """
+        queue = self.inputs[player]
+        if not is_action(action) or len(queue) >= MAX_PENDING_INPUTS:
+            return False
+        queue.append(action)
+        return True
+
+    def forfeit(self, player):
+        """End the match with the other player as the winner."""
+        if not self.over:
+            self.over = True
+            self.winner = 1 - player
+
+    def attack(self, player, lines):
+        """
+        Send the garbage a player's lock is worth to the opponent.
+
+        Args:
+            player: 0 or 1
+            lines: Lines the lock cleared
+        """
+        if lines:
+            attack = self.engines[player].cancel_garbage(ATTACK_LINES[min(lines, len(ATTACK_LINES) - 1)])
+            if attack:
+                self.engines[1 - player].receive_garbage(attack)
+
+    def step(self, inputs=None):
+        """
+        Advance the match by one tick.
+
+        Args:
+            inputs: Actions of each player for this tick (default: taken
+                from the queues filled by push_input); unknown actions are
+                skipped and at most MAX_INPUTS_PER_TICK are applied
+
+        Returns:
+            bool: True if anything changed
+        """
+        if self.over:
+            return False
+        self.frame += 1
+        changed = False
+        for player, engine in enumerate(self.engines):
+            if inputs is None:
+                queue = self.inputs[player]
+                for _ in range(min(len(queue), MAX_INPUTS_PER_TICK)):
+                    ACTIONS[queue.popleft()](engine)
+                    changed = True
+            else:
+                for action in valid_actions(inputs[player]):
+                    ACTIONS[action](engine)
+                    changed = True
+
+            # Gravity, in ticks per row at the player's level
+            self.gravity[player] += 1
+            if self.gravity[player] * 1000 >= engine.drop_interval * self.tick_rate:
+                self.gravity[player] = 0
+                engine.move_down()
+                changed = True
+
+        losers = [player for player, engine in enumerate(self.engines) if engine.game_over]
+        if losers:
+            self.over = True
+            self.winner = None if len(losers) == 2 else 1 - losers[0]
+        return changed
+
+    def snapshot(self):
+        """
+        Capture the simulation state (not the input queues).
+
+        Returns:
+            tuple: (frame, gravity, over, winner, engine GameStates)
+        """
+        return (
+            self.frame, tuple(self.gravity), self.over, self.winner,
+            tuple(engine.snapshot() for engine in self.engines),
+        )
+
+    def restore(self, snapshot):
+        """Return the simulation to a snapshot() result."""
+        self.frame, gravity, self.over, self.winner, states = snapshot
+        self.gravity[:] = gravity
+        for engine, state in zip(self.engines, states):
+            engine.restore(state)
+
+    def state(self):
+        """Return the match state sent to both players."""
+        players = []
+        for engine in self.engines:
+            piece = engine.current_piece
+            players.append({
+                "score": engine.score,
+                "lines": engine.lines_cleared,
+                "level": engine.level,
+                "garbage": engine.pending_garbage,
+                "piece": [piece.type, piece.rotation, engine.current_x, engine.current_y] if piece else None,
+                "next": engine.next_piece.type if engine.next_piece else None,
+                "board": engine.board.cells.hex(),
+            })
+        return {"type": "state", "frame": self.frame, "players": players}
+
+
+class BattleServer:
+    """
+    Pairs up connecting players and runs all matches from one tick loop.
+
+    A single task steps every active match each tick instead of running
+    one task per match, so thousands of matches cost one wakeup per tick.
+    """
+
+    def __init__(self, host="127.0.0.1", port=3002, tick_rate=TICK_RATE, seed=None, hub=None):
+        """
+        Initialize the server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on
+            tick_rate: Simulation ticks per second
+            seed: Seed for match seeds (default: random)
+            hub: SpectatorHub to stream matches to (see tetris_spectator)
+        """
+        self.host = host
+        self.port = port
+        self.tick_rate = tick_rate
+        self.rng = random.Random(seed)
+        self.server = None
+        self.tick_task = None
+        self.match_ids = itertools.count(1)
+        self.matches = {}
+        self.players = {}  # match id -> [writer, writer]
+        self.waiting = None
+        self.hub = hub
+        self.ticks = 0
+        self.overruns = 0
+
+    async def start(self):
+        """Start listening and ticking."""
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.tick_task = asyncio.ensure_future(self.run())
+        return self
+
+    async def stop(self):
+        """Stop the server."""
+        self.tick_task.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    def send(writers, message):
+        """Serialize a message once and write it to the given players."""
+        data = json.dumps(message, separators=(",", ":")).encode() + b"\n"
+        for writer in writers:
+            if writer is not None and not writer.is_closing():
+                writer.write(data)
+
+    def create_match(self, writers):
+        """
+        Start a match for two connected players.
+
+        Args:
+            writers: Stream writers of player 0 and player 1
+
+        Returns:
+            BattleMatch: The new match
+        """
+        match = BattleMatch(next(self.match_ids), self.rng.getrandbits(32), self.tick_rate)
+        self.matches[match.match_id] = match
+        self.players[match.match_id] = list(writers)
+        for player, writer in enumerate(writers):
+            self.send((writer,), {"type": "start", "match": match.match_id, "player": player, "seed": match.seed})
+        return match
+
+    async def handle_connection(self, reader, writer):
+        """Queue a player for a match and forward their inputs."""
+        if self.waiting is not None and self.waiting[1].is_closing():
+            # The waiting player left before an opponent arrived
+            self.waiting[0].cancel()
+            self.waiting = None
+
+        if self.waiting is None:
+            joined = asyncio.get_running_loop().create_future()
+            self.waiting = (joined, writer)
+            try:
+                match, player = await joined
+            except asyncio.CancelledError:
+                writer.close()
+                return
+        else:
+            joined, opponent = self.waiting
+            self.waiting = None
+            match = self.create_match((opponent, writer))
+            joined.set_result((match, 0))
+            player = 1
+
+        try:
+            while not match.over:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(message, dict) and message.get("type") == "input":
+                    match.push_input(player, message.get("action"))
+        except ConnectionError:
+            pass
+        finally:
+            match.forfeit(player)
+            writer.close()
+
+    def tick(self):
+        """Step every match once and send updates."""
+        self.ticks += 1
+        finished = []
+        for match_id, match in self.matches.items():
+            changed = match.step()
+            writers = self.players[match_id]
+            if changed:
+                self.send(writers, match.state())
+                if self.hub is not None:
+                    self.hub.publish(match_id, match.frame, match.engines)
+            if match.over:
+                self.send(writers, {"type": "end", "frame": match.frame, "winner": match.winner})
+                finished.append(match_id)
+                # Closing ends both players' handle_connection reads
+                for writer in writers:
+                    writer.close()
+        for match_id in finished:
+            del self.matches[match_id]
+            del self.players[match_id]
+            if self.hub is not None:
+                self.hub.close(match_id)
+
+    def watch(self, match_id):
+        """
+        Subscribe a spectator to a running match.
+
+        Args:
+            match_id: Match to watch
+
+        Returns:
+            Viewer: The subscription, or None if there is no such match or no hub
+        """
+        match = self.matches.get(match_id)
+        if match is None or self.hub is None:
+            return None
+        return self.hub.subscribe(match_id, match.frame, match.engines)
+
+    async def run(self):
+        """Tick at the fixed rate, catching up without drifting."""
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        deadline = loop.time()
+        while True:
+            self.tick()
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay < 0:
+                # Too slow for the tick rate; count it and start over from now
+                self.overruns += 1
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+
+async def serve(host, port, tick_rate):
+    """Run the battle server until cancelled."""
+    server = await BattleServer(host, port, tick_rate).start()
+    print(f"Tetris battle server listening on {server.host}:{server.port} at {tick_rate} ticks/s")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main(argv=None):
+    """Parse the command line and run the server."""
+    parser = argparse.ArgumentParser(description="Tetris head-to-head battle server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3002)
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.tick_rate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1095 @@
+"""
+Module containing the Tetris benchmark suite.
+Run `python tetris_bench.py <benchmark>`; every benchmark prints its
+results as JSON so runs can be saved, and
+`python tetris_bench.py compare old.json new.json` flags regressions
+between two saved runs.
+"""
+
+import argparse
+import ast
+import asyncio
+import json
+import os
+import random
+import time
+import tracemalloc
+import uuid
+
+from tetris_server import SUBMIT_BURST, SUBMIT_RATE
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Python entry points that are shipped to the browser
+FRONTENDS = ["tetris", "tetris_js", "tetris_game"]
+
+# Default load test traffic, as relative weights of TetrisAPI calls
+LOAD_MIX = "leaderboard=50,page=20,next_page=10,rank=10,submit=10"
+
+# Relative change that compare reports as a regression
+REGRESSION_THRESHOLD = 0.1
+
+
+def local_imports(module):
+    """
+    Find the local modules a module depends on, transitively.
+
+    Args:
+        module: Name of the entry point module
+
+    Returns:
+        list: Sorted names of every local module the entry point loads
+    """
+    seen = set()
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        path = os.path.join(ROOT, f"{name}.py")
+        if not os.path.exists(path):
+            continue
+        seen.add(name)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                pending.append(node.module)
+    return sorted(seen)
+
+
+def compile_time(modules, repeat=20):
+    """Return the best time in milliseconds to compile the given modules."""
+    sources = []
+    for name in modules:
+        with open(os.path.join(ROOT, f"{name}.py"), encoding="utf-8") as f:
+            sources.append((name, f.read()))
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name, source in sources:
+            compile(source, f"{name}.py", "exec")
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_payload(args):
+    """Measure the Python source bytes and compile time shipped per frontend."""
+    results = {"frontends": {}}
+    shipped = set()
+    for frontend in FRONTENDS:
+        modules = local_imports(frontend)
+        shipped.update(modules)
+        results["frontends"][frontend] = {
+            "modules": modules,
+            "bytes": sum(os.path.getsize(os.path.join(ROOT, f"{name}.py")) for name in modules),
+            "compile_ms": round(compile_time(modules, args.repeat), 3),
+        }
+
+    shipped = sorted(shipped)
+    results["total"] = {
+        "modules": shipped,
+        "bytes": sum(os.path.getsize(os.path.join(ROOT, f"{name}.py")) for name in shipped),
+        "compile_ms": round(compile_time(shipped, args.repeat), 3),
+    }
+    return results
+
+
+def random_scores(count, seed=0):
+    """Generate score objects shaped like the /api/scores payload."""
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"Player{rng.randrange(count // 10 + 1)}",
+            "score": rng.randrange(100000),
+            "level": rng.randrange(1, 30),
+            "lines": rng.randrange(300),
+            "date": f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        }
+        for _ in range(count)
+    ]
+
+
+def timed(func, repeat):
+    """Return the mean time in microseconds of calling func."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_leaderboard(args):
+    """Compare insert and page render cost of ScoreIndex against re-sorting a list."""
+    from tetris_scores import ScoreIndex, sort_key
+
+    scores = random_scores(args.count)
+    extra = random_scores(args.repeat, seed=1)
+
+    start = time.perf_counter()
+    index = ScoreIndex(scores)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    inserts = iter(extra)
+    insert_us = timed(lambda: index.add(next(inserts)), args.repeat)
+    page_us = {
+        f"{column}_{direction}": timed(lambda: index.page(column, direction, 0, args.page), args.repeat)
+        for column in ("score", "name", "date")
+        for direction in ("desc", "asc")
+    }
+
+    # Baseline: append and re-sort the whole list, as display_scores did
+    resorted = list(scores)
+    inserts = iter(extra)
+
+    def resort_insert():
+        resorted.append(next(inserts))
+        resorted.sort(key=lambda score: sort_key(score, "score"), reverse=True)
+
+    baseline_insert_us = timed(resort_insert, args.repeat)
+    baseline_page_us = timed(
+        lambda: sorted(resorted, key=lambda score: sort_key(score, "name"))[:args.page],
+        max(1, args.repeat // 10),
+    )
+
+    return {
+        "count": args.count,
+        "page": args.page,
+        "index": {"build_ms": round(build_ms, 2), "insert_us": round(insert_us, 2),
+                  "page_us": {key: round(value, 2) for key, value in page_us.items()}},
+        "resort": {"insert_us": round(baseline_insert_us, 2), "page_us": round(baseline_page_us, 2)},
+    }
+
+
+def bench_rank(args):
+    """Measure RankIndex insert and rank lookup cost with many stored scores."""
+    from tetris_ranking import RankIndex
+
+    rng = random.Random(0)
+    ranks = RankIndex()
+    start = time.perf_counter()
+    for _ in range(args.count):
+        ranks.add(rng.randrange(args.max_score))
+    insert_us = (time.perf_counter() - start) / args.count * 1e6
+
+    queries = [rng.randrange(args.max_score) for _ in range(args.repeat)]
+    start = time.perf_counter()
+    for score in queries:
+        ranks.rank(score)
+    rank_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+    return {
+        "count": args.count,
+        "max_score": args.max_score,
+        "insert_us": round(insert_us, 3),
+        "rank_us": round(rank_us, 3),
+    }
+
+
+def measure(build):
+    """
+    Run build() and return its result, wall time in ms and memory in bytes.
+
+    build() runs twice: once timed, and once traced to count the memory
+    its result keeps alive, since tracing slows allocation down.
+    """
+    start = time.perf_counter()
+    build()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    result = build()
+    memory = tracemalloc.get_traced_memory()[0] - start_memory
+    tracemalloc.stop()
+    return result, elapsed, memory
+
+
+def bench_records(args):
+    """Compare memory, ingest and sort cost of sorting score dicts per request and a ScoreIndex."""
+    from tetris_scores import SORT_COLUMNS, ScoreIndex, sort_key
+
+    body = json.dumps({"highScores": random_scores(args.count)})
+    results = {"count": args.count}
+
+    # Per-record dicts, as decoded from the response, re-sorted with a key
+    # function every time the sort column changes
+    scores, ingest_ms, memory = measure(lambda: json.loads(body)["highScores"])
+    start = time.perf_counter()
+    for column in SORT_COLUMNS:
+        sorted(scores, key=lambda score: sort_key(score, column), reverse=True)
+    sort_ms = (time.perf_counter() - start) * 1000
+    results["dict"] = {"ingest_ms": ingest_ms, "sort_ms": sort_ms, "bytes_per_record": memory / args.count}
+
+    # The client's ScoreIndex sorts every column once at ingest; changing
+    # the sort column only reads a page. Its memory is on top of the dicts
+    decoded = json.loads(body)["highScores"]
+    index, index_ms, memory = measure(lambda: ScoreIndex(decoded))
+    start = time.perf_counter()
+    for column in SORT_COLUMNS:
+        index.page(column, "desc", 0, 50)
+    sort_ms = (time.perf_counter() - start) * 1000
+    results["index"] = {"ingest_ms": ingest_ms + index_ms, "sort_ms": sort_ms,
+                        "bytes_per_record": memory / args.count}
+
+    for kind in ("dict", "index"):
+        results[kind] = {key: round(value, 2) for key, value in results[kind].items()}
+    return results
+
+
+def bench_windows(args):
+    """Compare windowed top-K queries from day buckets against scanning every score."""
+    from tetris_ranking import DAY_SECONDS, WINDOWS, WindowedLeaderboard
+
+    now = time.time()
+    rng = random.Random(0)
+    scores = [(int(now) - rng.randrange(args.days * DAY_SECONDS), rng.randrange(100000))
+              for _ in range(args.count)]
+
+    start = time.perf_counter()
+    windows = WindowedLeaderboard(args.page, clock=lambda: now)
+    for seq, (epoch, score) in enumerate(scores):
+        windows.add(epoch, score, seq)
+    insert_us = (time.perf_counter() - start) / args.count * 1e6
+
+    results = {"count": args.count, "days": args.days, "page": args.page, "insert_us": round(insert_us, 3)}
+    for window, days in WINDOWS.items():
+        first = (int(now) // DAY_SECONDS - days + 1) * DAY_SECONDS
+
+        def scan():
+            in_window = [(score, seq) for seq, (epoch, score) in enumerate(scores) if epoch >= first]
+            return sorted(in_window, reverse=True)[:args.page]
+
+        results[window] = {
+            "buckets_us": round(timed(lambda: windows.top(window, args.page), args.repeat), 2),
+            "scan_us": round(timed(scan, max(1, args.repeat // 100)), 2),
+        }
+
+    # A score dated tomorrow, as from a client whose clock runs ahead, is on today's boards
+    board = WindowedLeaderboard(args.page, clock=lambda: now)
+    board.add(int(now) + DAY_SECONDS, 1, 0)
+    results["tomorrow_ok"] = board.top("day") == board.top("week") == [0]
+    return results
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def latency_summary(latencies):
+    """Summarize latencies in seconds as milliseconds."""
+    latencies = sorted(latencies)
+    return {
+        f"{name}_ms": round(percentile(latencies, fraction) * 1000, 3)
+        for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+    }
+
+
+class LoadClient:
+    """
+    One virtual player talking to the scores API over a keep-alive connection.
+
+    Each call is shaped like a TetrisAPI request: the plain leaderboard with
+    If-None-Match, first and next pages, a rank lookup or a batch of queued
+    score submissions. Every client sends its own X-Forwarded-For address,
+    so servers that trust it rate limit each virtual player separately.
+    """
+
+    def __init__(self, host, port, rng, address="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.rng = rng
+        self.address = address
+        self.reader = None
+        self.writer = None
+        self.etag = None
+        self.cursor = None
+
+    async def close(self):
+        """Close the connection."""
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def http(self, method, target, headers=None, body=b""):
+        """
+        Send one request and read the response.
+
+        Returns:
+            tuple: (status, headers, body bytes)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}",
+                 f"X-Forwarded-For: {self.address}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length") or 0)
+        return status, response_headers, await self.reader.readexactly(length) if length else b""
+
+    async def leaderboard(self):
+        """GET /api/scores, revalidating the last copy like LeaderboardCache."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        status, response_headers, _ = await self.http("GET", "/api/scores", headers)
+        self.etag = response_headers.get("etag", self.etag)
+        return status
+
+    async def page(self):
+        """GET the first page of a random sort order."""
+        sort = self.rng.choice(("score", "name", "date"))
+        status, _, body = await self.http("GET", f"/api/scores?limit=10&sort={sort}&direction=desc")
+        if status == 200:
+            self.cursor = (sort, json.loads(body).get("nextCursor"))
+        return status
+
+    async def next_page(self):
+        """GET the page after the last one loaded, or a first page."""
+        if not self.cursor or not self.cursor[1]:
+            return await self.page()
+        sort, cursor = self.cursor
+        status, _, body = await self.http("GET", f"/api/scores?limit=10&sort={sort}&direction=desc&cursor={cursor}")
+        if status == 200:
+            self.cursor = (sort, json.loads(body).get("nextCursor"))
+        return status
+
+    async def rank(self):
+        """GET /api/rank for a random score."""
+        status, _, _ = await self.http("GET", f"/api/rank?score={self.rng.randrange(100000)}")
+        return status
+
+    async def submit(self):
+        """POST a batch of one to three scores, as ScoreSubmissionQueue does."""
+        scores = [
+            {
+                "name": f"Load{self.rng.randrange(1000)}",
+                "score": self.rng.randrange(100000),
+                "level": self.rng.randrange(1, 30),
+                "lines": self.rng.randrange(300),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "id": str(uuid.UUID(int=self.rng.getrandbits(128))),
+            }
+            for _ in range(self.rng.randint(1, 3))
+        ]
+        body = json.dumps({"highScores": scores}).encode()
+        status, _, _ = await self.http("POST", "/api/scores", {"Content-Type": "application/json"}, body)
+        return status
+
+
+async def run_load(host, port, args):
+    """Drive the server with virtual clients and collect per-operation results."""
+    mix = dict(item.split("=") for item in args.mix.split(","))
+    operations = list(mix)
+    weights = [float(mix[name]) for name in operations]
+    results = {name: {"latencies": [], "errors": 0, "statuses": {}} for name in operations}
+    deadline = time.perf_counter() + args.duration
+
+    async def client(number):
+        rng = random.Random(args.seed * 100003 + number)
+        player = LoadClient(host, port, rng, f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}")
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                try:
+                    status = await getattr(player, name)()
+                    failed = status >= 400
+                except (OSError, ValueError, asyncio.IncompleteReadError):
+                    status = "failed"
+                    failed = True
+                    await player.close()
+                statuses = results[name]["statuses"]
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                results[name]["latencies"].append(time.perf_counter() - start)
+                results[name]["errors"] += failed
+                if args.think:
+                    await asyncio.sleep(rng.expovariate(1000 / args.think))
+        finally:
+            await player.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(args.clients)))
+    return results, time.perf_counter() - start
+
+
+def bench_load(args):
+    """Load test the scores API with concurrent virtual clients and report latency percentiles."""
+    from tetris_server import RateLimiter, ScoreServer
+    from tetris_storage import ScoreStore
+
+    async def main():
+        server = None
+        host, port = args.host, args.port
+        if not port:
+            # Stand-in server in this process, seeded with a leaderboard
+            limiter = RateLimiter(args.submit_rate, args.submit_burst)
+            server = await ScoreServer(ScoreStore(random_scores(args.scores)), port=0, limiter=limiter,
+                                       trust_proxy=True).start()
+            host, port = server.host, server.port
+        try:
+            return await run_load(host, port, args)
+        finally:
+            if server is not None:
+                await server.stop()
+
+    results, elapsed = asyncio.run(main())
+    latencies = [latency for result in results.values() for latency in result["latencies"]]
+    requests = len(latencies)
+    errors = sum(result["errors"] for result in results.values())
+    return {
+        "config": {"clients": args.clients, "duration_s": args.duration, "mix": args.mix,
+                   "think_ms": args.think, "scores": args.scores,
+                   "submit_rate": args.submit_rate, "submit_burst": args.submit_burst},
+        "requests": requests,
+        "throughput_per_s": round(requests / elapsed, 1),
+        "error_rate": round(errors / requests, 5) if requests else 0.0,
+        "latency": latency_summary(latencies),
+        "operations": {
+            name: {
+                "requests": len(result["latencies"]),
+                "statuses": result["statuses"],
+                "error_rate": round(result["errors"] / len(result["latencies"]), 5) if result["latencies"] else 0.0,
+                "latency": latency_summary(result["latencies"]),
+            }
+            for name, result in results.items()
+        },
+    }
+
+
+def metric_direction(path):
+    """
+    Tell whether a result metric is better higher (1), lower (-1) or not compared (0).
+
+    Latencies, times, error rates and byte counts (including bytes per
+    second) should go down; other rates per second ("_per_s" or
+    "_per_second") should go up. Other values (counts, configuration)
+    are not compared.
+    """
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith(("_ms", "_us", "error_rate")) or "bytes" in name:
+        return -1
+    if name.endswith(("per_s", "per_second", "per_core", "speedup")):
+        return 1
+    return 0
+
+
+def flatten(results, prefix=""):
+    """Flatten nested benchmark results to {"a.b.c": number}."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def bench_compare(args):
+    """Compare two saved benchmark results and flag regressions."""
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = flatten(json.load(f))
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = flatten(json.load(f))
+
+    metrics = {}
+    regressions = []
+    for path in sorted(baseline.keys() & candidate.keys()):
+        direction = metric_direction(path)
+        if not direction or path.startswith("config."):
+            continue
+        old, new = baseline[path], candidate[path]
+        if old:
+            change = round((new - old) / old, 4)
+            regressed = -direction * change > args.threshold
+        else:
+            # No relative change from zero; any move the wrong way regresses
+            change = None
+            regressed = -direction * (new - old) > 0
+        metrics[path] = {"baseline": old, "candidate": new, "change": change, "regressed": regressed}
+        if regressed:
+            regressions.append(path)
+    return {"threshold": args.threshold, "regressions": regressions, "metrics": metrics}
+
+
+def bench_stores(args):
+    """Measure the insert cost of each persistent score store as history grows."""
+    import tempfile
+    from tetris_storage import JSONScoreStore, LogScoreStore, SQLiteScoreStore
+
+    results = {"inserts": args.inserts}
+    for history in args.history:
+        scores = random_scores(history)
+        extra = random_scores(args.inserts, seed=1)
+        results[str(history)] = {}
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "scores.json")
+            stores = {
+                "json": lambda: JSONScoreStore(snapshot),
+                "sqlite": lambda: SQLiteScoreStore(os.path.join(directory, "scores.db"), snapshot),
+                "log": lambda: LogScoreStore(os.path.join(directory, "scores.jsonl"), snapshot, compact_records=0),
+            }
+            for name, open_store in stores.items():
+                # Every store starts from the same history
+                with open(snapshot, "w", encoding="utf-8") as f:
+                    json.dump({"highScores": scores}, f)
+                store = open_store()
+                inserts = iter(extra)
+                insert_us = timed(lambda: store.add_scores([next(inserts)]), args.inserts)
+                store.close()
+                results[str(history)][name] = {"insert_us": round(insert_us, 2)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        results["log_compaction_ok"] = log_compaction_keeps_scores(directory)
+    return results
+
+
+def log_compaction_keeps_scores(directory):
+    """
+    Start a log compaction between appending a score and indexing it,
+    then check that the score survives a reopen.
+
+    Args:
+        directory: Empty directory for the log and snapshot
+
+    Returns:
+        bool: True if every score was reloaded
+    """
+    from tetris_storage import LogScoreStore
+
+    class RacingStore(LogScoreStore):
+        def persist(self, scores):
+            super().persist(scores)
+            # Give a compaction the chance to run before the scores are indexed
+            compactor = self.compact(wait=False)
+            if compactor is not None:
+                compactor.join(0.2)
+
+    path = os.path.join(directory, "scores.jsonl")
+    snapshot = os.path.join(directory, "scores.json")
+    scores = random_scores(20)
+    store = RacingStore(path, snapshot, compact_records=0)
+    for score in scores:
+        store.add_scores([score])
+    store.close()
+    return len(LogScoreStore(path, snapshot, compact_records=0).scores) == len(scores)
+
+
+def bench_cache(args):
+    """Check that cached leaderboard responses match freshly built ones as scores arrive, and time a hit."""
+    import gzip
+    from tetris_server import ScoreServer
+    from tetris_storage import ScoreStore
+
+    rng = random.Random(args.seed)
+    store = ScoreStore(random_scores(args.scores, args.seed))
+    targets = [
+        "/api/scores",
+        "/api/scores?window=day",
+        "/api/scores?window=week&limit=10",
+        "/api/scores?window=all&limit=25",
+        "/api/scores?view=players&limit=10",
+        "/api/scores?limit=10",
+        "/api/scores?limit=10&sort=name&direction=asc",
+        "/api/scores?limit=10&sort=lines",
+        "/api/scores?limit=10&since=2025-03-01&until=2025-06-30",
+    ]
+
+    async def main():
+        server = ScoreServer(store)
+        first = json.loads((await ScoreServer(store).handle_request("GET", "/api/scores?limit=10", {}, b""))[2])
+        targets.append(f"/api/scores?limit=10&cursor={first['nextCursor']}")
+
+        mismatches = []
+        checks = 0
+        for round_number in range(args.rounds):
+            # Scores spread over the last week, some high enough to reach every top list
+            scores = [
+                {
+                    "name": f"Player{rng.randrange(args.scores // 10 + 1)}",
+                    "score": rng.randrange(200000),
+                    "level": rng.randrange(1, 30),
+                    "lines": rng.randrange(300),
+                    "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - rng.randrange(7 * 86400))),
+                }
+                for _ in range(rng.randrange(1, 4))
+            ]
+            status, _, _ = await server.handle_request("POST", "/api/scores", {}, json.dumps(scores).encode(),
+                                                       f"client-{round_number}")
+            if status != 200:
+                raise RuntimeError(f"Insert failed with status {status}")
+
+            fresh = ScoreServer(store)
+            for target in targets:
+                expected = (await fresh.handle_request("GET", target, {}, b""))[2]
+                plain = (await server.handle_request("GET", target, {}, b""))[2]
+                packed = (await server.handle_request("GET", target, {"accept-encoding": "gzip"}, b""))[2]
+                checks += 1
+                if plain != expected or gzip.decompress(packed) != expected:
+                    mismatches.append({"round": round_number, "target": target})
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            await server.handle_request("GET", "/api/scores", {"accept-encoding": "gzip"}, b"")
+        hit_us = (time.perf_counter() - start) / args.repeat * 1e6
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            server.responses.clear()
+            await server.handle_request("GET", "/api/scores", {"accept-encoding": "gzip"}, b"")
+        build_us = (time.perf_counter() - start) / args.repeat * 1e6
+        return checks, mismatches, hit_us, build_us
+
+    checks, mismatches, hit_us, build_us = asyncio.run(main())
+    return {
+        "rounds": args.rounds,
+        "checks": checks,
+        "mismatches": mismatches[:10],
+        "ok": not mismatches,
+        "hit_us": round(hit_us, 2),
+        "build_us": round(build_us, 2),
+    }
+
+
+def bench_battle(args):
+    """Measure how many battle matches one core can simulate at a fixed tick rate."""
+    from tetris_battle import ACTIONS, BattleMatch
+
+    rng = random.Random(0)
+    actions = list(ACTIONS)
+    matches = [BattleMatch(number, rng.getrandbits(32), args.tick_rate) for number in range(args.matches)]
+    finished = 0
+    state_bytes = 0
+
+    start = time.process_time()
+    for _ in range(args.ticks):
+        for number, match in enumerate(matches):
+            # Bots press a random key now and then
+            for player in (0, 1):
+                if rng.random() < args.input_rate:
+                    match.push_input(player, rng.choice(actions))
+            if match.step():
+                # Serialized once per tick, as the server sends it to both players
+                state_bytes += len(json.dumps(match.state(), separators=(",", ":")))
+            if match.over:
+                finished += 1
+                matches[number] = BattleMatch(match.match_id, rng.getrandbits(32), args.tick_rate)
+    elapsed = time.process_time() - start
+
+    match_tick_us = elapsed / (args.ticks * args.matches) * 1e6
+    return {
+        "matches": args.matches,
+        "ticks": args.ticks,
+        "tick_rate": args.tick_rate,
+        "finished": finished,
+        "tick_ms": round(elapsed / args.ticks * 1000, 3),
+        "match_tick_us": round(match_tick_us, 3),
+        "matches_per_core": int(1e6 / args.tick_rate / match_tick_us),
+        "state_bytes_per_s": round(state_bytes / args.matches / args.ticks * args.tick_rate, 1),
+    }
+
+
+def bench_spectate(args):
+    """Measure spectator stream bandwidth per viewer and the cost of fanning frames out."""
+    from tetris_battle import ACTIONS, BattleMatch
+    from tetris_spectator import FrameEncoder, SpectatorHub
+
+    rng = random.Random(0)
+    actions = list(ACTIONS)
+    match = BattleMatch(1, rng.getrandbits(32), args.tick_rate)
+    hub = SpectatorHub(queue_size=args.ticks + 1)
+    viewers = [hub.subscribe(1, match.frame, match.engines) for _ in range(args.viewers)]
+    keyframes = FrameEncoder()
+    json_bytes = keyframe_bytes = delta_bytes = published = 0
+    publish_time = 0.0
+
+    for _ in range(args.ticks):
+        for player in (0, 1):
+            if rng.random() < args.input_rate:
+                match.push_input(player, rng.choice(actions))
+        if not match.step():
+            continue
+        json_bytes += len(json.dumps(match.state(), separators=(",", ":"))) + 1
+        keyframe_bytes += len(keyframes.encode(match.frame, match.engines, keyframe=True))
+        sent = hub.bytes_sent
+        start = time.perf_counter()
+        hub.publish(1, match.frame, match.engines)
+        publish_time += time.perf_counter() - start
+        delta_bytes += (hub.bytes_sent - sent) // args.viewers
+        published += 1
+        for viewer in viewers:
+            viewer.frames.clear()
+        if match.over:
+            hub.close(1)
+            match = BattleMatch(1, rng.getrandbits(32), args.tick_rate)
+            viewers = [hub.subscribe(1, match.frame, match.engines) for _ in range(args.viewers)]
+
+    seconds = args.ticks / args.tick_rate
+    return {
+        "viewers": args.viewers,
+        "ticks": args.ticks,
+        "frames": published,
+        "json_bytes_per_s": round(json_bytes / seconds, 1),
+        "keyframe_bytes_per_s": round(keyframe_bytes / seconds, 1),
+        "delta_bytes_per_s": round(delta_bytes / seconds, 1),
+        "publish_us": round(publish_time / max(published, 1) * 1e6, 2),
+        "publish_per_viewer_us": round(publish_time / max(published, 1) / args.viewers * 1e6, 4),
+    }
+
+
+def bench_snapshot(args):
+    """Compare snapshot, restore and search-branch cost of GameState against deep copies."""
+    import copy
+    from tetris_engine import TetrisEngine
+    from tetris_state import GameState
+
+    # A mid-game position: garbage plus pieces dropped across the columns
+    engine = TetrisEngine(0)
+    engine.reset(0)
+    engine.receive_garbage(4)
+    for placement in range(args.placements):
+        for _ in range(5):
+            engine.move_left()
+        for _ in range(placement * 3 % 9):
+            engine.move_right()
+        engine.hard_drop()
+    root = engine.snapshot()
+
+    def full_snapshot():
+        engine.base = None
+        return engine.snapshot()
+
+    def branch():
+        engine.restore(root)
+        engine.move_left()
+        engine.hard_drop()
+        return engine.snapshot()
+
+    def deepcopy_branch():
+        child = copy.deepcopy(engine)
+        child.move_left()
+        child.hard_drop()
+        return child
+
+    data = root.to_bytes()
+    results = {
+        "filled_cells": len(engine.board.cells) - engine.board.cells.count(0),
+        "state_bytes": len(data),
+        "snapshot_us": round(timed(full_snapshot, args.repeat), 3),
+        "restore_us": round(timed(lambda: engine.restore(root), args.repeat), 3),
+        "to_bytes_us": round(timed(root.to_bytes, args.repeat), 3),
+        "from_bytes_us": round(timed(lambda: GameState.from_bytes(data), args.repeat), 3),
+        "deepcopy_us": round(timed(lambda: copy.deepcopy(engine), args.repeat), 3),
+        "branch_us": round(timed(branch, args.repeat), 3),
+        "deepcopy_branch_us": round(timed(deepcopy_branch, args.repeat), 3),
+    }
+
+    # Memory kept alive by a search tree level of children of one root
+    engine.restore(root)
+    _, _, state_memory = measure(lambda: [branch() for _ in range(args.children)])
+    _, _, copy_memory = measure(lambda: [deepcopy_branch() for _ in range(args.children)])
+    results["bytes_per_child_state"] = state_memory // args.children
+    results["bytes_per_child_deepcopy"] = copy_memory // args.children
+    return results
+
+
+def bench_rollback(args):
+    """Run two rollback peers over a jittery simulated link and time their resimulation."""
+    import heapq
+    from tetris_battle import ACTIONS, BattleMatch
+    from tetris_rollback import RollbackSession
+
+    rng = random.Random(0)
+    actions = list(ACTIONS)
+    frame_ms = 1000 / args.tick_rate
+    seed = rng.getrandbits(32)
+    peers = [
+        RollbackSession(seed, player, args.input_delay, args.window, args.budget_ms, args.tick_rate)
+        for player in (0, 1)
+    ]
+    sent = [{}, {}]  # player -> frame -> actions, for the reference replay
+    in_flight = []  # (arrival frame, order, receiving player, frame, actions)
+    order = 0
+
+    def deliver(now):
+        while in_flight and in_flight[0][0] <= now:
+            _, _, player, frame, message = heapq.heappop(in_flight)
+            peers[player].add_remote_input(frame, message)
+
+    def step(now, peer, player, typing):
+        nonlocal order
+        if typing and rng.random() < args.input_rate:
+            peer.add_local_input(rng.choice(actions))
+        message = peer.advance()
+        if message is not None:
+            sent[player][message[0]] = message[1]
+            # Each message gets its own delay, so they can arrive out of order
+            delay = args.latency_ms + rng.uniform(0, args.jitter_ms)
+            heapq.heappush(in_flight, (now + delay / frame_ms, order, 1 - player) + message)
+            order += 1
+
+    for now in range(args.frames):
+        for player, peer in enumerate(peers):
+            step(now, peer, player, True)
+        deliver(now + 1)
+
+    # Stop typing, line the peers up on one frame, then let every input
+    # arrive and run one more frame to apply the last corrections
+    while peers[0].frame != peers[1].frame:
+        player = 0 if peers[0].frame < peers[1].frame else 1
+        step(now, peers[player], player, False)
+        deliver(float("inf"))
+    deliver(float("inf"))
+    for player, peer in enumerate(peers):
+        step(now, peer, player, False)
+
+    # Both peers and a replay of every input with no latency must agree
+    reference = BattleMatch(None, seed, args.tick_rate)
+    for frame in range(peers[0].frame):
+        reference.step([sent[player].get(frame, ()) for player in (0, 1)])
+    states = [peer.match.snapshot() for peer in peers]
+    seconds = args.frames / args.tick_rate
+    rollbacks = sum(peer.rollbacks for peer in peers)
+    return {
+        "frames": args.frames,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "input_delay": args.input_delay,
+        "window": args.window,
+        "rollbacks_per_second": round(rollbacks / len(peers) / seconds, 2),
+        "frames_per_rollback": round(sum(peer.resimulated for peer in peers) / max(rollbacks, 1), 2),
+        "stalls": sum(peer.stalls for peer in peers),
+        "max_resimulation_ms": round(max(peer.max_resimulation for peer in peers) * 1000, 3),
+        "in_sync": states[0] == states[1] == reference.snapshot(),
+    }
+
+
+def bench_env(args):
+    """Measure environment steps per second, one environment at a time and batched."""
+    from tetris_env import TetrisEnv, VectorTetrisEnv, numpy
+
+    rng = random.Random(0)
+    env = TetrisEnv(0)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, terminated, truncated, _ = env.step(rng.choice(env.legal_actions()))
+        if terminated or truncated:
+            env.reset()
+    single = args.steps / (time.perf_counter() - start)
+
+    envs = VectorTetrisEnv(args.batch, seed=0)
+    envs.reset()
+    rounds = max(args.steps // args.batch, 1)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        envs.step([rng.choice(env.legal_actions()) for env in envs.envs])
+    batched = rounds * args.batch / (time.perf_counter() - start)
+
+    return {
+        "numpy": numpy is not None,
+        "batch": args.batch,
+        "steps_per_s": round(single, 1),
+        "batched_steps_per_s": round(batched, 1),
+    }
+
+
+def bench_perft(args):
+    """Check the perft reference counts and measure move generation in nodes per second."""
+    from tetris_perft import REFERENCE_POSITIONS, run_position
+
+    nodes = 0
+    seconds = 0.0
+    failed = []
+    for position in REFERENCE_POSITIONS:
+        result = run_position(position)
+        nodes += result["nodes"]
+        seconds += result["seconds"]
+        if not result["ok"]:
+            failed.append(position["name"])
+    return {
+        "positions": len(REFERENCE_POSITIONS),
+        "failed": failed,
+        "nodes": nodes,
+        "seconds": round(seconds, 3),
+        "nodes_per_s": round(nodes / seconds, 1),
+    }
+
+
+def bench_search(args):
+    """Measure root-parallel move search speedup over the serial search, per worker count."""
+    from tetris_ai import SearchPool, best_move
+    from tetris_board import Board
+    from tetris_engine import TetrisEngine
+    from tetris_piece import Piece
+
+    def play(choose):
+        # A seeded bot game; every worker count must pick the same moves
+        engine = TetrisEngine(args.seed)
+        engine.reset(args.seed)
+        moves = []
+        start = time.perf_counter()
+        while len(moves) < args.moves and not engine.game_over:
+            move = choose(engine.board, [engine.current_piece.type, engine.next_piece.type])
+            moves.append(move)
+            piece_type, rotation, engine.current_x, engine.current_y = move
+            engine.current_piece = Piece(piece_type, rotation)
+            engine.hard_drop()
+        return moves, (time.perf_counter() - start) * 1000 / len(moves)
+
+    baseline, serial_ms = play(best_move)
+    results = {"cpus": os.cpu_count(), "moves": len(baseline), "serial_move_ms": round(serial_ms, 2)}
+    workers = args.workers or sorted({1, 2} | {2 ** n for n in range(os.cpu_count().bit_length())})
+    deterministic = True
+    for count in workers:
+        with SearchPool(count) as pool:
+            pool.best_move(Board(), [1, 1])  # Start the workers outside the timing
+            moves, move_ms = play(pool.best_move)
+        deterministic = deterministic and moves == baseline
+        results[f"workers_{count}"] = {
+            "move_ms": round(move_ms, 2),
+            "speedup": round(serial_ms / move_ms, 2),
+        }
+    results["deterministic"] = deterministic
+    return results
+
+
+BENCHMARKS = {
+    "payload": bench_payload,
+    "leaderboard": bench_leaderboard,
+    "rank": bench_rank,
+    "records": bench_records,
+    "windows": bench_windows,
+    "stores": bench_stores,
+    "load": bench_load,
+    "cache": bench_cache,
+    "battle": bench_battle,
+    "spectate": bench_spectate,
+    "snapshot": bench_snapshot,
+    "rollback": bench_rollback,
+    "env": bench_env,
+    "perft": bench_perft,
+    "search": bench_search,
+    "compare": bench_compare,
+}
+
+
+def main(argv=None):
+    """Parse the command line and run the selected benchmark."""
+    parser = argparse.ArgumentParser(description="Tetris benchmark suite")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    payload = subparsers.add_parser("payload", help=bench_payload.__doc__)
+    payload.add_argument("--repeat", type=int, default=20)
+
+    leaderboard = subparsers.add_parser("leaderboard", help=bench_leaderboard.__doc__)
+    leaderboard.add_argument("--count", type=int, default=100000)
+    leaderboard.add_argument("--page", type=int, default=10)
+    leaderboard.add_argument("--repeat", type=int, default=200)
+
+    rank = subparsers.add_parser("rank", help=bench_rank.__doc__)
+    rank.add_argument("--count", type=int, default=1000000)
+    rank.add_argument("--max-score", type=int, default=5000000)
+    rank.add_argument("--repeat", type=int, default=100000)
+
+    records = subparsers.add_parser("records", help=bench_records.__doc__)
+    records.add_argument("--count", type=int, default=100000)
+
+    windows = subparsers.add_parser("windows", help=bench_windows.__doc__)
+    windows.add_argument("--count", type=int, default=100000)
+    windows.add_argument("--days", type=int, default=30)
+    windows.add_argument("--page", type=int, default=100)
+    windows.add_argument("--repeat", type=int, default=1000)
+
+    stores = subparsers.add_parser("stores", help=bench_stores.__doc__)
+    stores.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    stores.add_argument("--inserts", type=int, default=50)
+
+    load = subparsers.add_parser("load", help=bench_load.__doc__)
+    load.add_argument("--clients", type=int, default=1000, help="Concurrent virtual clients")
+    load.add_argument("--duration", type=float, default=10.0, help="Seconds to run for")
+    load.add_argument("--mix", default=LOAD_MIX, help="Operation weights, e.g. " + LOAD_MIX)
+    load.add_argument("--think", type=float, default=0.0, help="Mean pause between a client's requests (ms)")
+    load.add_argument("--scores", type=int, default=10000, help="Scores to seed the stand-in server with")
+    load.add_argument("--submit-rate", type=float, default=SUBMIT_RATE,
+                      help="Stand-in server's per-client submission rate limit")
+    load.add_argument("--submit-burst", type=int, default=SUBMIT_BURST)
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=0, help="Server to test (default: start a stand-in)")
+    load.add_argument("--seed", type=int, default=0)
+
+    cache = subparsers.add_parser("cache", help=bench_cache.__doc__)
+    cache.add_argument("--scores", type=int, default=10000, help="Scores stored before the first round")
+    cache.add_argument("--rounds", type=int, default=200, help="Insert rounds, each followed by a check of every query")
+    cache.add_argument("--repeat", type=int, default=1000)
+    cache.add_argument("--seed", type=int, default=0)
+
+    battle = subparsers.add_parser("battle", help=bench_battle.__doc__)
+    battle.add_argument("--matches", type=int, default=1000)
+    battle.add_argument("--ticks", type=int, default=600)
+    battle.add_argument("--tick-rate", type=int, default=60)
+    battle.add_argument("--input-rate", type=float, default=0.1, help="Chance per tick that a bot presses a key")
+
+    spectate = subparsers.add_parser("spectate", help=bench_spectate.__doc__)
+    spectate.add_argument("--viewers", type=int, default=1000)
+    spectate.add_argument("--ticks", type=int, default=3600)
+    spectate.add_argument("--tick-rate", type=int, default=60)
+    spectate.add_argument("--input-rate", type=float, default=0.1, help="Chance per tick that a bot presses a key")
+
+    snapshot = subparsers.add_parser("snapshot", help=bench_snapshot.__doc__)
+    snapshot.add_argument("--repeat", type=int, default=10000)
+    snapshot.add_argument("--children", type=int, default=1000)
+    snapshot.add_argument("--placements", type=int, default=8, help="Pieces dropped to build the position")
+
+    rollback = subparsers.add_parser("rollback", help=bench_rollback.__doc__)
+    rollback.add_argument("--frames", type=int, default=3600)
+    rollback.add_argument("--tick-rate", type=int, default=60)
+    rollback.add_argument("--latency-ms", type=float, default=60.0, help="One-way delay of every message")
+    rollback.add_argument("--jitter-ms", type=float, default=40.0, help="Extra random delay of up to this much")
+    rollback.add_argument("--input-delay", type=int, default=2)
+    rollback.add_argument("--window", type=int, default=8)
+    rollback.add_argument("--budget-ms", type=float, default=4.0)
+    rollback.add_argument("--input-rate", type=float, default=0.1, help="Chance per frame that a bot presses a key")
+
+    env = subparsers.add_parser("env", help=bench_env.__doc__)
+    env.add_argument("--steps", type=int, default=20000)
+    env.add_argument("--batch", type=int, default=64)
+
+    subparsers.add_parser("perft", help=bench_perft.__doc__)
+
+    search = subparsers.add_parser("search", help=bench_search.__doc__)
+    search.add_argument("--moves", type=int, default=20)
+    search.add_argument("--seed", type=int, default=0)
+    search.add_argument("--workers", type=int, nargs="+", help="Worker counts to try (default: powers of two up to the CPU count)")
+
+    compare = subparsers.add_parser("compare", help=bench_compare.__doc__)
+    compare.add_argument("baseline", help="Results file of the earlier run")
+    compare.add_argument("candidate", help="Results file of the run to check")
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                         help="Relative change counted as a regression")
+
+    args = parser.parse_args(argv)
+    results = BENCHMARKS[args.benchmark](args)
+    print(json.dumps(results, indent=2))
+    if args.benchmark == "compare" and results["regressions"]:
+        raise SystemExit(1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,109 +1,177 @@
-from tetris_constants import COLS, ROWS
+from tetris_constants import COLS, ROWS, GARBAGE_CELL
+
+# Bit mask with one bit per row
+ALL_ROWS = (1 << ROWS) - 1
 
 class Board:
     """
     Represents the Tetris game board.
     Handles board state, piece placement, and line clearing.
+
+    Cells are stored row-major in one flat byte buffer (``cells``), so
+    line clears are a single slice move and the board can be copied,
+    serialized or shared without walking nested lists.
+
+    ``dirty`` has bit y set when row y may have changed since it was last
+    cleared, which lets snapshots reuse the rows that did not. Code that
+    writes ``cells`` directly should call mark_dirty().
     """
-    
-    def __init__(self):
-        """Initialize an empty game board."""
-        self.grid = self.create_empty_board()
+
+    def __init__(self, buffer=None):
+        """
+        Initialize an empty game board.
+
+        Args:
+            buffer: Optional writable buffer of ROWS * COLS bytes to use
+                as cell storage (default: a new bytearray)
+        """
+        self.rows = ROWS
+        self.cols = COLS
+        self.cells = buffer if buffer is not None else self.create_empty_board()
         self.lines_cleared = 0
-    
+        self.dirty = ALL_ROWS
+
     def create_empty_board(self):
-        """Create and return an empty game board."""
-        return [[0 for _ in range(COLS)] for _ in range(ROWS)]
-    
+        """Create and return an empty game board buffer."""
+        return bytearray(ROWS * COLS)
+
     def reset(self):
         """Reset the board to its initial empty state."""
-        self.grid = self.create_empty_board()
+        self.cells[:] = bytes(ROWS * COLS)
         self.lines_cleared = 0
-    
+        self.dirty = ALL_ROWS
+
+    def mark_dirty(self, mask=ALL_ROWS):
+        """Record that the rows in a bit mask have changed."""
+        self.dirty |= mask
+
+    @property
+    def grid(self):
+        """The board as a list of rows (a copy, for display and debugging)."""
+        cells = self.cells
+        return [list(cells[y * COLS:(y + 1) * COLS]) for y in range(ROWS)]
+
+    def get(self, x, y):
+        """Return the piece type at (x, y), or 0 if the cell is empty."""
+        return self.cells[y * COLS + x]
+
     def is_valid_position(self, piece, piece_x, piece_y):
         """
         Check if a piece can be placed at the given position.
-        
+
         Args:
-            piece: The tetromino shape to check
+            piece: The tetromino piece to check
             piece_x: X coordinate of the piece
             piece_y: Y coordinate of the piece
-            
+
         Returns:
             bool: True if the position is valid, False otherwise
         """
-        for y in range(len(piece)):
-            for x in range(len(piece[y])):
-                if piece[y][x]:
-                    # Check if the piece is within board boundaries
-                    if (piece_x + x < 0 or piece_x + x >= COLS or 
-                        piece_y + y < 0 or piece_y + y >= ROWS):
-                        return False
-                    
-                    # Check if the position is already occupied
-                    if self.grid[piece_y + y][piece_x + x] != 0:
-                        return False
-        
+        cells = self.cells
+        for dx, dy in piece.cells:
+            x = piece_x + dx
+            y = piece_y + dy
+            # Check if the piece is within board boundaries
+            if x < 0 or x >= COLS or y < 0 or y >= ROWS:
+                return False
+
+            # Check if the position is already occupied
+            if cells[y * COLS + x]:
+                return False
+
         return True
-    
-    def place_piece(self, piece, piece_x, piece_y, piece_type):
+
+    def place_piece(self, piece, piece_x, piece_y):
         """
         Place a piece permanently on the board.
-        
+
         Args:
-            piece: The tetromino shape to place
+            piece: The tetromino piece to place
             piece_x: X coordinate of the piece
             piece_y: Y coordinate of the piece
-            piece_type: Type index of the piece (for coloring)
-            
+
         Returns:
             bool: True if the piece was placed successfully, False otherwise
         """
         if not self.is_valid_position(piece, piece_x, piece_y):
             return False
-        
-        for y in range(len(piece)):
-            for x in range(len(piece[y])):
-                if piece[y][x]:
-                    self.grid[piece_y + y][piece_x + x] = piece_type
-        
+
+        cells = self.cells
+        for dx, dy in piece.cells:
+            cells[(piece_y + dy) * COLS + piece_x + dx] = piece.type
+        self.dirty |= ((1 << len(piece.shape)) - 1) << piece_y
+
         return True
-    
-    def check_lines(self):
+
+    def check_lines(self, first_row=0, last_row=ROWS - 1):
         """
         Check for completed lines and remove them.
-        
+
+        Args:
+            first_row: First row that may have been completed
+            last_row: Last row that may have been completed
+
         Returns:
             int: Number of lines cleared
         """
-        lines_to_clear = []
-        
-        # Find complete lines
-        for y in range(ROWS):
-            if all(self.grid[y]):
-                lines_to_clear.append(y)
-        
-        # Remove complete lines
-        for line in lines_to_clear:
-            # Remove the line
-            self.grid.pop(line)
-            # Add a new empty line at the top
-            self.grid.insert(0, [0 for _ in range(COLS)])
-        
+        cells = self.cells
+        cleared = 0
+
+        # Only rows touched by the last placed piece can be complete
+        y = max(last_row, 0)
+        top = max(first_row, 0)
+        while y >= top:
+            start = y * COLS
+            if 0 not in cells[start:start + COLS]:
+                # Shift everything above down by one row and empty the top row
+                cells[COLS:start + COLS] = cells[0:start]
+                cells[0:COLS] = bytes(COLS)
+                self.dirty |= (2 << y) - 1
+                cleared += 1
+                # The row at y now holds the row from above; check it again
+                top += 1
+            else:
+                y -= 1
+
         # Update lines cleared count
-        self.lines_cleared += len(lines_to_clear)
-        
-        return len(lines_to_clear)
-    
+        self.lines_cleared += cleared
+
+        return cleared
+
+    def add_garbage(self, count, hole):
+        """
+        Push garbage rows in from the bottom, moving everything else up.
+
+        Args:
+            count: Number of garbage rows
+            hole: Column left empty in every garbage row
+
+        Returns:
+            bool: True if blocks were pushed off the top (the player tops out)
+        """
+        count = min(count, ROWS)
+        if count <= 0:
+            return False
+        cells = self.cells
+        overflow = any(cells[0:count * COLS])
+
+        # Shift the stack up and fill the bottom rows
+        cells[0:(ROWS - count) * COLS] = cells[count * COLS:]
+        row = bytearray([GARBAGE_CELL]) * COLS
+        row[hole] = 0
+        cells[(ROWS - count) * COLS:] = row * count
+        self.dirty = ALL_ROWS
+        return overflow
+
     def is_game_over(self, piece, piece_x, piece_y):
         """
         Check if the game is over (can't place a new piece).
-        
+
         Args:
-            piece: The new tetromino shape
+            piece: The new tetromino piece
             piece_x: X coordinate of the new piece
             piece_y: Y coordinate of the new piece
-            
+
         Returns:
             bool: True if the game is over, False otherwise
         """
@@ -16,8 +16,12 @@ COLORS = [
     "#00FF00",  # S piece (green)
     "#800080",  # T piece (purple)
     "#FF0000",  # Z piece (red)
+    "#808080",  # Garbage (gray)
 ]
 
+# Cell value of garbage rows sent by a battle opponent
+GARBAGE_CELL = 8
+
 # Tetromino shapes
 SHAPES = [
     [],  # Empty placeholder for indexing
@@ -30,10 +34,18 @@ SHAPES = [
     [[1, 1, 0], [0, 1, 1]],  # Z
 ]
 
+# Preview canvas block size
+PREVIEW_BLOCK_SIZE = 20
+
 # Game timing constants
 DEFAULT_DROP_INTERVAL = 1000  # milliseconds between automatic downward moves
-LEVEL_SPEED_FACTOR = 100  # How much to decrease interval per level
+LEVEL_SPEED_FACTOR = 50  # How much to decrease interval per level
+MIN_DROP_INTERVAL = 100  # Fastest automatic drop interval
 
 # Scoring constants
-POINTS_PER_LINE = 100
+LINE_SCORES = [0, 40, 100, 300, 1200]  # Points for 0, 1, 2, 3, 4 lines (times level)
+HARD_DROP_POINTS = 1  # Points per row for a hard drop
 LEVEL_UP_LINES = 10  # Lines needed to level up
+
+# Battle constants
+ATTACK_LINES = [0, 0, 1, 2, 4]  # Garbage lines sent for clearing 0, 1, 2, 3, 4 lines
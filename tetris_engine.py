@@ -0,0 +1,322 @@
+"""
+Module containing the Tetris rules engine.
+Provides the DOM-free game state that every frontend drives.
+"""
+
+from tetris_constants import (
+    COLS, ROWS, LINE_SCORES, HARD_DROP_POINTS, LEVEL_UP_LINES,
+    DEFAULT_DROP_INTERVAL, LEVEL_SPEED_FACTOR, MIN_DROP_INTERVAL,
+)
+from tetris_board import ALL_ROWS, Board
+from tetris_piece import Piece
+from tetris_state import GameRandom, GameState
+
+class TetrisEngine:
+    """
+    Runs the Tetris rules: movement, rotation with wall kicks, locking,
+    line clearing, scoring and levels. Knows nothing about the DOM, so
+    frontends only translate input into calls and draw the result.
+    """
+
+    def __init__(self, seed=None, board=None):
+        """
+        Initialize the engine.
+
+        Args:
+            seed: Seed for the piece generator (default: random)
+            board: Board instance to play on (default: a new Board)
+        """
+        self.board = board if board is not None else Board()
+        self.rng = GameRandom(seed)
+        # Separate generator so garbage never changes the piece sequence
+        self.garbage_rng = GameRandom(seed)
+        # Last snapshot taken or restored; the board's dirty rows are relative to it
+        self.base = None
+        # Called with the number of lines cleared each time a piece locks
+        self.on_lock = None
+        self.pending_garbage = 0
+        self.current_piece = None
+        self.next_piece = None
+        self.current_x = 0
+        self.current_y = 0
+        self.score = 0
+        self.level = 1
+        self.game_over = False
+
+    @property
+    def lines_cleared(self):
+        """Total number of lines cleared this game."""
+        return self.board.lines_cleared
+
+    @property
+    def drop_interval(self):
+        """Milliseconds between automatic downward moves at the current level."""
+        return max(MIN_DROP_INTERVAL, DEFAULT_DROP_INTERVAL - (self.level - 1) * LEVEL_SPEED_FACTOR)
+
+    def reset(self, seed=None):
+        """
+        Start a new game.
+
+        Args:
+            seed: Optional new seed for the piece generator
+        """
+        if seed is not None:
+            self.rng.seed(seed)
+            self.garbage_rng.seed(seed)
+        self.board.reset()
+        self.pending_garbage = 0
+        self.score = 0
+        self.level = 1
+        self.game_over = False
+        self.next_piece = Piece.generate_random(self.rng)
+        self.spawn_piece()
+
+    def spawn_piece(self):
+        """
+        Make the next piece current and place it at the top of the board.
+
+        Returns:
+            bool: False if the new piece does not fit (game over)
+        """
+        self.current_piece = self.next_piece
+        self.next_piece = Piece.generate_random(self.rng)
+
+        # Starting position (centered at top)
+        self.current_x = (COLS - len(self.current_piece.shape[0])) // 2
+        self.current_y = 0
+
+        # Check if the new piece can be placed
+        if not self.board.is_valid_position(self.current_piece, self.current_x, self.current_y):
+            self.game_over = True
+            return False
+        return True
+
+    def is_valid_move(self, x, y, piece=None):
+        """Check if the current (or given) piece fits at (x, y)."""
+        return self.board.is_valid_position(piece or self.current_piece, x, y)
+
+    def move(self, dx, dy):
+        """
+        Move the current piece if the target position is free.
+
+        Returns:
+            bool: True if the piece moved
+        """
+        if self.game_over or not self.current_piece:
+            return False
+        if self.board.is_valid_position(self.current_piece, self.current_x + dx, self.current_y + dy):
+            self.current_x += dx
+            self.current_y += dy
+            return True
+        return False
+
+    def move_left(self):
+        """Move the current piece left."""
+        return self.move(-1, 0)
+
+    def move_right(self):
+        """Move the current piece right."""
+        return self.move(1, 0)
+
+    def move_down(self):
+        """
+        Move the current piece down, locking it if it cannot move.
+
+        Returns:
+            bool: True if the piece moved, False if it was locked
+        """
+        if self.game_over or not self.current_piece:
+            return False
+        if self.move(0, 1):
+            return True
+        self.lock_piece()
+        return False
+
+    def ghost_y(self):
+        """Return the row the current piece would land on if dropped."""
+        y = self.current_y
+        while self.board.is_valid_position(self.current_piece, self.current_x, y + 1):
+            y += 1
+        return y
+
+    def hard_drop(self):
+        """
+        Drop the current piece to the bottom and lock it.
+
+        Returns:
+            int: Number of rows the piece dropped
+        """
+        if self.game_over or not self.current_piece:
+            return 0
+        landing_y = self.ghost_y()
+        distance = landing_y - self.current_y
+        self.current_y = landing_y
+        self.score += distance * HARD_DROP_POINTS
+        self.lock_piece()
+        return distance
+
+    def rotate(self, clockwise=True):
+        """
+        Rotate the current piece, trying SRS wall kicks if it does not fit.
+
+        Returns:
+            bool: True if the piece rotated
+        """
+        if self.game_over or not self.current_piece:
+            return False
+        result = self.kick(self.current_piece, self.current_x, self.current_y, clockwise)
+        if result is None:
+            return False
+        self.current_piece, self.current_x, self.current_y = result
+        return True
+
+    def kick(self, piece, x, y, clockwise=True):
+        """
+        Find where a piece ends up when rotated, trying SRS wall kicks.
+
+        Args:
+            piece: Piece to rotate
+            x: X coordinate of the piece
+            y: Y coordinate of the piece
+            clockwise: Direction of rotation
+
+        Returns:
+            tuple: (rotated piece, x, y), or None if no kick fits
+        """
+        rotated = piece.get_rotated(clockwise)
+        for kick_x, kick_y in piece.get_wall_kick_tests(piece.rotation, rotated.rotation):
+            # SRS offsets have y pointing up; board rows grow downwards
+            if self.board.is_valid_position(rotated, x + kick_x, y - kick_y):
+                return rotated, x + kick_x, y - kick_y
+        return None
+
+    def lock_piece(self):
+        """
+        Lock the current piece in place, clear lines and spawn the next piece.
+
+        Returns:
+            int: Number of lines cleared
+        """
+        piece = self.current_piece
+        self.board.place_piece(piece, self.current_x, self.current_y)
+
+        # Only the rows covered by the piece can have been completed
+        top = self.current_y
+        lines = self.board.check_lines(top, top + len(piece.shape) - 1)
+        if self.on_lock is not None:
+            self.on_lock(lines)
+
+        if lines:
+            self.score += LINE_SCORES[min(lines, len(LINE_SCORES) - 1)] * self.level
+            self.level = self.board.lines_cleared // LEVEL_UP_LINES + 1
+        elif self.pending_garbage:
+            # Garbage received in a battle rises after a piece clears nothing
+            hole = self.garbage_rng.randrange(COLS)
+            overflow = self.board.add_garbage(self.pending_garbage, hole)
+            self.pending_garbage = 0
+            if overflow:
+                self.game_over = True
+                return lines
+
+        self.spawn_piece()
+        return lines
+
+    def receive_garbage(self, lines):
+        """
+        Queue garbage lines from an opponent.
+
+        Lines the player clears first cancel queued garbage (see
+        cancel_garbage); the rest rise after the next lock that clears
+        nothing.
+
+        Args:
+            lines: Number of garbage lines
+        """
+        self.pending_garbage += lines
+
+    def cancel_garbage(self, lines):
+        """
+        Use an attack to cancel queued garbage.
+
+        Args:
+            lines: Garbage lines the player's clear is worth
+
+        Returns:
+            int: Lines left over to send to the opponent
+        """
+        cancelled = min(self.pending_garbage, lines)
+        self.pending_garbage -= cancelled
+        return lines - cancelled
+
+    def snapshot(self):
+        """
+        Capture the game state.
+
+        Rows the board has not changed since the last snapshot or restore
+        are shared with that state rather than read again.
+
+        Returns:
+            GameState: The immutable snapshot
+        """
+        board = self.board
+        base = self.base
+        dirty = board.dirty if base is not None else ALL_ROWS
+        if dirty:
+            cells = board.cells
+            rows = list(base.rows) if base is not None else [0] * ROWS
+            for y in range(ROWS):
+                if dirty >> y & 1:
+                    start = y * COLS
+                    rows[y] = int.from_bytes(cells[start:start + COLS], "little")
+            rows = tuple(rows)
+        else:
+            rows = base.rows
+        board.dirty = 0
+
+        piece = self.current_piece
+        state = GameState(
+            rows,
+            (piece.type, piece.rotation, self.current_x, self.current_y) if piece else None,
+            self.next_piece.type if self.next_piece else 0,
+            self.score, board.lines_cleared, self.level, self.pending_garbage, self.game_over,
+            self.rng.getstate(), self.garbage_rng.getstate(),
+        )
+        self.base = state
+        return state
+
+    def restore(self, state):
+        """
+        Return the game to a snapshot.
+
+        Only rows that differ from the last snapshot or restore are
+        written back to the board.
+
+        Args:
+            state: GameState from snapshot() (of this or any engine)
+        """
+        board = self.board
+        base = self.base
+        dirty = board.dirty if base is not None else ALL_ROWS
+        cells = board.cells
+        for y, row in enumerate(state.rows):
+            if dirty >> y & 1 or row is not base.rows[y]:
+                start = y * COLS
+                cells[start:start + COLS] = row.to_bytes(COLS, "little")
+        board.dirty = 0
+        board.lines_cleared = state.lines
+
+        piece = state.piece
+        if piece is not None:
+            self.current_piece = Piece(piece[0], piece[1])
+            self.current_x = piece[2]
+            self.current_y = piece[3]
+        else:
+            self.current_piece = None
+        self.next_piece = Piece(state.next_type) if state.next_type else None
+        self.score = state.score
+        self.level = state.level
+        self.pending_garbage = state.pending_garbage
+        self.game_over = state.game_over
+        self.rng.setstate(state.rng_state)
+        self.garbage_rng.setstate(state.garbage_rng_state)
+        self.base = state
@@ -0,0 +1,252 @@
+"""
+Module containing a reinforcement-learning environment for the game.
+Follows the Gym conventions (reset/step, terminated/truncated) without
+depending on Gym, and works on the rules engine alone, with no DOM.
+
+Observations are views over the engine's board buffer rather than
+copies: NumPy arrays when NumPy is installed, memoryviews otherwise.
+They change as the game goes on, so copy one to keep it.
+"""
+
+import random
+
+from tetris_board import Board
+from tetris_constants import COLS, ROWS
+from tetris_engine import TetrisEngine
+from tetris_piece import CELLS
+
+try:
+    import numpy
+except ImportError:  # Observations fall back to memoryviews
+    numpy = None
+
+# One action per (rotation, column of the piece's leftmost block)
+ACTION_COUNT = 4 * COLS
+
+# Rotations from spawn: rotation -> clockwise turns (False: one counterclockwise)
+ROTATION_PATHS = ((), (True,), (True, True), (False,))
+
+# Offset of the leftmost block of each piece type and rotation
+LEFT_OFFSETS = tuple(
+    tuple(min(dx for dx, _ in cells) for cells in states) if states else ()
+    for states in CELLS
+)
+
+
+def as_array(buffer, shape, dtype="uint8"):
+    """
+    View a byte buffer with a shape, without copying it.
+
+    Args:
+        buffer: Writable buffer
+        shape: Shape of the view
+        dtype: "uint8" or "bool"
+
+    Returns:
+        A NumPy array if NumPy is installed, otherwise a memoryview
+    """
+    if numpy is not None:
+        return numpy.frombuffer(buffer, dtype=dtype).reshape(shape)
+    return memoryview(buffer).cast("?" if dtype == "bool" else "B", shape)
+
+
+def as_vector(values, dtype):
+    """Return a list of per-environment values as an array when NumPy is installed."""
+    return numpy.array(values, dtype=dtype) if numpy is not None else values
+
+
+class TetrisEnv:
+    """
+    Single-player environment where each step places the current piece.
+
+    An action picks a rotation and the column of the piece's leftmost
+    block: action = rotation * COLS + column. A placement is legal when
+    the piece can reach it from its spawn position by rotating (with
+    wall kicks) and then sliding sideways; the piece is then hard
+    dropped. The reward is the score gained.
+    """
+
+    def __init__(self, seed=None, buffer=None, mask_buffer=None, max_steps=None):
+        """
+        Initialize the environment.
+
+        Args:
+            seed: Seed for the piece sequence (default: random)
+            buffer: Optional ROWS * COLS byte buffer for the board
+            mask_buffer: Optional ACTION_COUNT byte buffer for the action mask
+            max_steps: Steps after which an episode is truncated (default: never)
+        """
+        self.engine = TetrisEngine(seed, Board(buffer))
+        self.seed = seed
+        self.max_steps = max_steps
+        self.steps = 0
+        self.mask = mask_buffer if mask_buffer is not None else bytearray(ACTION_COUNT)
+        self.targets = {}  # legal action -> (piece, x, y) to drop from
+        self.observation = as_array(self.engine.board.cells, (ROWS, COLS))
+        self.action_mask = as_array(self.mask, (ACTION_COUNT,), "bool")
+
+    def reset(self, seed=None):
+        """
+        Start a new episode.
+
+        Args:
+            seed: Optional new seed for the piece sequence
+
+        Returns:
+            tuple: (observation, info)
+        """
+        self.engine.reset(seed if seed is not None else self.seed)
+        self.seed = None
+        self.steps = 0
+        self.update_mask()
+        return self.observation, self.info(0)
+
+    def step(self, action):
+        """
+        Place the current piece.
+
+        Args:
+            action: Legal action index (see action_mask)
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info)
+
+        Raises:
+            ValueError: If the action is not legal now
+        """
+        target = self.targets.get(action)
+        if target is None:
+            raise ValueError(f"Illegal action: {action}")
+        engine = self.engine
+        score = engine.score
+        lines = engine.lines_cleared
+        engine.current_piece, engine.current_x, engine.current_y = target
+        engine.hard_drop()
+        self.steps += 1
+        self.update_mask()
+
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        return (self.observation, engine.score - score, engine.game_over,
+                truncated and not engine.game_over, self.info(engine.lines_cleared - lines))
+
+    def info(self, lines):
+        """Return the info dict for a step that cleared some lines."""
+        engine = self.engine
+        return {
+            "lines": lines,
+            "score": engine.score,
+            "piece": engine.current_piece.type if engine.current_piece else 0,
+            "next": engine.next_piece.type if engine.next_piece else 0,
+        }
+
+    def legal_actions(self):
+        """Return the legal actions as a list."""
+        return list(self.targets)
+
+    def update_mask(self):
+        """Work out which placements the current piece can reach."""
+        mask = self.mask
+        mask[:] = bytes(ACTION_COUNT)
+        targets = self.targets
+        targets.clear()
+        engine = self.engine
+        piece = engine.current_piece
+        if engine.game_over or piece is None:
+            return
+        is_valid = engine.board.is_valid_position
+
+        for rotation, path in enumerate(ROTATION_PATHS):
+            placed = (piece, engine.current_x, engine.current_y)
+            for clockwise in path:
+                placed = engine.kick(*placed, clockwise)
+                if placed is None:
+                    break
+            if placed is None:
+                continue
+
+            rotated, start, y = placed
+            base = rotation * COLS + LEFT_OFFSETS[rotated.type][rotated.rotation]
+            for direction in (-1, 1):
+                x = start if direction < 0 else start + 1
+                while is_valid(rotated, x, y):
+                    mask[base + x] = 1
+                    targets[base + x] = (rotated, x, y)
+                    x += direction
+
+
+class VectorTetrisEnv:
+    """
+    Steps several TetrisEnv instances at once.
+
+    All boards live in one buffer and all action masks in another, so
+    observations and masks for the whole batch are single views of
+    shape (count, ROWS, COLS) and (count, ACTION_COUNT). An episode that
+    ends is reset in the same step; its final score and lines are in
+    that step's info.
+    """
+
+    def __init__(self, count, seed=None, max_steps=None):
+        """
+        Initialize the environments.
+
+        Args:
+            count: Number of environments
+            seed: Seed for the environments' seeds (default: random)
+            max_steps: Steps after which an episode is truncated
+        """
+        size = ROWS * COLS
+        self.boards = bytearray(count * size)
+        self.masks = bytearray(count * ACTION_COUNT)
+        boards = memoryview(self.boards)
+        masks = memoryview(self.masks)
+        rng = random.Random(seed)
+        self.envs = [
+            TetrisEnv(
+                rng.getrandbits(32), boards[number * size:(number + 1) * size],
+                masks[number * ACTION_COUNT:(number + 1) * ACTION_COUNT], max_steps,
+            )
+            for number in range(count)
+        ]
+        self.observations = as_array(self.boards, (count, ROWS, COLS))
+        self.action_masks = as_array(self.masks, (count, ACTION_COUNT), "bool")
+
+    def reset(self, seed=None):
+        """
+        Start a new episode in every environment.
+
+        Args:
+            seed: Optional seed for the environments' seeds
+
+        Returns:
+            tuple: (observations, infos)
+        """
+        rng = random.Random(seed) if seed is not None else None
+        infos = [env.reset(rng.getrandbits(32) if rng else None)[1] for env in self.envs]
+        return self.observations, infos
+
+    def step(self, actions):
+        """
+        Step every environment.
+
+        Args:
+            actions: One legal action per environment
+
+        Returns:
+            tuple: (observations, rewards, terminated, truncated, infos)
+        """
+        rewards = []
+        terminated = []
+        truncated = []
+        infos = []
+        for env, action in zip(self.envs, actions):
+            _, reward, done, cut, info = env.step(int(action))
+            if done or cut:
+                info["final_score"] = env.engine.score
+                info["final_lines"] = env.engine.lines_cleared
+                env.reset()
+            rewards.append(reward)
+            terminated.append(done)
+            truncated.append(cut)
+            infos.append(info)
+        return (self.observations, as_vector(rewards, "int64"), as_vector(terminated, "bool"),
+                as_vector(truncated, "bool"), infos)
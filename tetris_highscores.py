@@ -3,83 +3,231 @@ Module for handling Tetris high scores.
 Provides functions for loading, saving, and displaying high scores.
 """
 
-from js import document, window, console, fetch
+from js import document, window, console
 from pyodide.ffi import create_proxy
-import json
 import asyncio
 
+from tetris_api import TetrisAPI, ScoreSubmissionQueue
+from tetris_scores import ScoreIndex, SORT_COLUMNS, display_date, sort_key
+
+# Row key of the placeholder shown when there are no scores
+EMPTY_ROW_KEY = "__empty__"
+
+# Rows fetched and revealed per page
+PAGE_SIZE = 10
+
+# Distance in pixels from the bottom of the table that loads the next page
+SCROLL_THRESHOLD = 50
+
+# Rows loaded for the "best per player" view, which is sorted locally
+VIEW_LIMIT = 100
+
 class HighScoreManager:
     """
     Manages high scores for the Tetris game.
     Handles loading, saving, and displaying high scores.
     """
     
-    def __init__(self, score_container_id="high-scores-body"):
+    def __init__(self, score_container_id="high-scores-body", api=None):
         """
         Initialize the high score manager.
         
         Args:
             score_container_id: ID of the HTML element to display scores in
+            api: TetrisAPI to load and save scores through (default: a new one)
         """
         self.scores = []
+        self.index = ScoreIndex()
+        self.api = api or TetrisAPI()
+        self.loaded_etag = None
+        
+        # Paging state for the current sort order
+        self.loaded_rows = []
+        self.visible_count = PAGE_SIZE
+        self.next_cursor = None
+        self.paginated = False
+        self.loading_page = False
+        
+        # Scores are submitted in the background and survive failures
+        self.submissions = ScoreSubmissionQueue(self.api)
+        self.submissions.start()
         self.score_container_id = score_container_id
         self.score_container = document.getElementById(score_container_id)
         self.table_container = document.getElementById("high-scores-table-container")
         
-        # Set up sorting functionality
+        # Set up sorting functionality; view is None for all scores, or
+        # "players" for each player's best score
+        self.current_view = None
         self.current_sort_column = "score"
         self.current_sort_direction = "desc"
+        self.sort_headers = []
+        self.sort_proxies = []
+        self.setup_sorting()
+        self.view_buttons = []
+        self.view_proxies = []
+        self.setup_views()
+        self.setup_scrolling()
+        
+        # Table rows currently displayed, by row key
+        self.row_nodes = {}
+        self.row_order = []
         
         # Load scores immediately on initialization
-        asyncio.ensure_future(self.load_scores())
+        self.load_generation = 0
+        self.load_task = asyncio.ensure_future(self.load_scores())
     
     async def load_scores(self):
         """
-        Load high scores from the server.
+        Load the first page of high scores in the current sort order,
+        showing any cached copy before revalidating it.
         
         Returns:
             list: The loaded high scores
         """
         try:
             console.log("Loading high scores from server...")
+            if self.current_view:
+                query = {"limit": VIEW_LIMIT, "view": self.current_view}
+            else:
+                query = {"limit": PAGE_SIZE, "sort": self.current_sort_column, "direction": self.current_sort_direction}
+            cache = self.api.cache_for(self.api.scores_query(**query))
             
-            # Get API URL with window.location.origin to ensure it works both locally and on deployed site
-            api_url = f"{window.location.origin}/api/scores"
-            console.log(f"API URL: {api_url}")
+            # Render the cached page immediately, if there is one
+            cached = cache.scores
+            if cached is not None and self.loaded_etag is None:
+                self.show_scores(cached, cache.etag)
             
-            # Fetch scores from the server
-            response = await fetch(api_url)
+            # Revalidate; concurrent loads share one request through the API
+            self.load_generation += 1
+            generation = self.load_generation
+            scores = await self.api.get_scores(**query)
             
-            if response.ok:
-                # Parse the JSON response
-                data = await response.json()
-                console.log(f"Received high scores data: {json.dumps(data)}")
-                
-                # Handle different response formats
-                if isinstance(data, list):
-                    self.scores = data
-                elif isinstance(data, dict) and "highScores" in data and isinstance(data["highScores"], list):
-                    self.scores = data["highScores"]
-                else:
-                    console.error("Invalid high scores data format:", data)
-                    self.scores = []
-                
-                console.log(f"Loaded {len(self.scores)} scores from server")
-                
-                # Display the scores
-                self.display_scores()
-                
+            # A newer load has been started; let it display its own result
+            if generation != self.load_generation:
                 return self.scores
-            else:
-                console.error(f"Error loading scores: {response.status} {response.statusText}")
-                return []
+            
+            # A 304 keeps the cached scores and their ETag
+            etag = cache.etag
+            if etag is None or etag != self.loaded_etag:
+                self.show_scores(scores, etag)
+            
+            console.log(f"Loaded {len(self.scores)} scores")
+            return self.scores
         except Exception as e:
             console.error(f"Error loading scores: {str(e)}")
             return []
     
+    def show_scores(self, scores, etag=None):
+        """
+        Index and display a leaderboard.
+        
+        Args:
+            scores: ScorePage from the API
+            etag: ETag the scores were served with
+        """
+        # A paginated server sends pages already in the current order; an
+        # older server sends everything and the index sorts it locally
+        self.paginated = getattr(scores, "paginated", False)
+        self.next_cursor = getattr(scores, "next_cursor", None)
+        self.loaded_rows = list(scores) if self.paginated else []
+        
+        # Build the per-column sort indexes once
+        self.index.reset([] if self.paginated else scores)
+        self.scores = self.loaded_rows if self.paginated else self.index.scores
+        self.loaded_etag = etag
+        self.visible_count = PAGE_SIZE
+        self.display_scores()
+    
+    async def show_more(self):
+        """Reveal the next page of scores, fetching it from the server if needed."""
+        if self.loading_page:
+            return
+        
+        if self.visible_count < len(self.scores):
+            self.visible_count += PAGE_SIZE
+            self.display_scores()
+            return
+        
+        if not self.paginated or not self.next_cursor:
+            return
+        
+        self.loading_page = True
+        generation = self.load_generation
+        try:
+            page = await self.api.get_scores(
+                limit=PAGE_SIZE,
+                cursor=self.next_cursor,
+                sort=self.current_sort_column,
+                direction=self.current_sort_direction,
+            )
+            
+            # The sort order changed while the page was loading
+            if generation != self.load_generation:
+                return
+            
+            # A failed request comes back as an empty unpaginated page; keep
+            # the cursor so that scrolling again retries it
+            if not page.paginated:
+                console.warn("Could not load more scores")
+                return
+            
+            self.loaded_rows.extend(page)
+            self.next_cursor = page.next_cursor
+            self.visible_count += PAGE_SIZE
+            self.display_scores()
+        except Exception as e:
+            # Runs as a scroll-triggered task; nothing else would see the error
+            console.error(f"Error loading more scores: {str(e)}")
+        finally:
+            self.loading_page = False
+    
+    def setup_scrolling(self):
+        """Load more scores when the table is scrolled near its bottom."""
+        if not self.table_container:
+            return
+        
+        def on_scroll(event):
+            container = self.table_container
+            if container.scrollTop + container.clientHeight >= container.scrollHeight - SCROLL_THRESHOLD:
+                asyncio.ensure_future(self.show_more())
+        
+        self.scroll_proxy = create_proxy(on_scroll)
+        self.table_container.addEventListener("scroll", self.scroll_proxy)
+    
+    def add_score(self, score):
+        """
+        Add a new score to the locally displayed scores.
+        
+        Args:
+            score: Score object
+        """
+        if not self.paginated:
+            # The index keeps every column sorted
+            self.index.add(score)
+            return
+        
+        # Insert into the loaded rows where the server would order it: the
+        # newest score goes first among equal keys when descending, last
+        # when ascending
+        column = self.current_sort_column
+        key = sort_key(score, column)
+        descending = self.current_sort_direction == "desc"
+        for position, row in enumerate(self.loaded_rows):
+            row_key = sort_key(row, column)
+            if (row_key <= key) if descending else (row_key > key):
+                self.loaded_rows.insert(position, score)
+                return
+        
+        # Past the loaded rows: only append if there is no unloaded gap before it
+        if not self.next_cursor:
+            self.loaded_rows.append(score)
+    
     async def save_score(self, player_name, score, level, lines):
         """
-        Save a new high score to the server.
+        Save a new high score.
+        
+        The score is shown immediately and queued for submission; the
+        queue retries until the server has it.
         
         Args:
             player_name: Name of the player
@@ -88,7 +236,7 @@ class HighScoreManager:
             lines: Number of lines cleared
             
         Returns:
-            bool: True if the score was saved successfully, False otherwise
+            bool: True if the score was queued, False otherwise
         """
         try:
             # Create score object
@@ -97,149 +245,287 @@ class HighScoreManager:
                 "score": score,
                 "level": level,
                 "lines": lines,
-                "date": window.Date().toISOString().split('T')[0]  # Current date in YYYY-MM-DD format
+                "date": window.Date.new().toISOString()  # Current time in ISO 8601 (UTC)
             }
             
-            # Get API URL with window.location.origin
-            api_url = f"{window.location.origin}/api/scores"
-            console.log(f"Saving score to: {api_url}")
+            # Queue for submission; the queue batches and retries
+            self.submissions.enqueue(new_score)
+            console.log("Score queued for submission")
             
-            # Send score to server
-            response = await fetch(api_url, {
-                "method": "POST",
-                "headers": {
-                    "Content-Type": "application/json"
-                },
-                "body": json.dumps([new_score])
-            })
+            # Add to local scores; the per-player view is rebuilt by the server
+            if self.current_view is None:
+                self.add_score(new_score)
             
-            if response.ok:
-                console.log("Score saved successfully")
-                
-                # Add to local scores and sort
-                self.scores.append(new_score)
-                self.sort_scores(self.current_sort_column, self.current_sort_direction)
-                
-                # Update display
-                self.display_scores()
-                
-                return True
-            else:
-                console.error(f"Error saving score: {response.status} {response.statusText}")
-                return False
+            # Tell the player where the score placed and their personal best
+            asyncio.ensure_future(self.show_rank(score))
+            asyncio.ensure_future(self.show_player_best(player_name, score))
+            
+            # Update display
+            self.display_scores()
+            
+            return True
         except Exception as e:
             console.error(f"Error saving score: {str(e)}")
             return False
     
+    async def show_rank(self, score):
+        """
+        Show the leaderboard place of a score.
+        
+        Args:
+            score: Player's score
+            
+        Returns:
+            int: The rank, or None if it could not be fetched
+        """
+        rank = await self.api.get_rank(score)
+        if rank is None:
+            return None
+        
+        console.log(f"Score {score} placed #{rank:,}")
+        rank_element = document.getElementById("player-rank")
+        if rank_element:
+            rank_element.textContent = f"You placed #{rank:,}"
+        return rank
+    
+    async def show_player_best(self, player_name, score=0):
+        """
+        Show a player's best score.
+        
+        Args:
+            player_name: Name of the player
+            score: Score just played, counted even if the server does not have it yet
+            
+        Returns:
+            int: The best score, or None if it could not be fetched
+        """
+        player = await self.api.get_player(player_name, history=0)
+        if player is None:
+            return None
+        
+        best = max((player.get("best") or {}).get("score", 0), score)
+        best_element = document.getElementById("player-best")
+        if best_element:
+            best_element.textContent = f"Your best: {best:,}"
+        return best
+    
+    def set_view(self, view):
+        """
+        Switch between all scores (None) and each player's best score ("players").
+        
+        Args:
+            view: View to show
+        """
+        if view == self.current_view:
+            return
+        self.current_view = view
+        self.update_view_indicators()
+        self.loaded_etag = None
+        self.load_task = asyncio.ensure_future(self.load_scores())
+    
     def sort_scores(self, column, direction):
         """
-        Sort the scores based on the specified column and direction.
+        Set the column and direction the scores are displayed in.
+        
+        The index keeps every column sorted already, so this only selects
+        which order display_scores walks.
         
         Args:
             column: Column to sort by (name, score, level, lines, date)
             direction: Sort direction (asc, desc)
         """
-        if not self.scores:
+        if column not in SORT_COLUMNS:
             return
         
-        # Define comparison function based on column
-        def get_value(score, col):
-            if col == "name":
-                return score.get("name", "").lower()
-            elif col in ["score", "level", "lines"]:
-                return int(score.get(col, 0))
-            elif col == "date":
-                return score.get("date", "")
-            else:
-                return 0
-        
-        # Sort the scores
-        reverse = direction == "desc"
-        self.scores.sort(key=lambda x: get_value(x, column), reverse=reverse)
-        
         # Update sort state
         self.current_sort_column = column
         self.current_sort_direction = direction
     
-    def display_scores(self, max_scores=10):
+    def display_scores(self, max_scores=None):
         """
         Display high scores in the score container.
         
+        Existing rows are reused by key and only cells whose text changed
+        are written, so re-rendering after a sort or a new score costs a
+        handful of DOM calls instead of rebuilding the table.
+        
         Args:
-            max_scores: Maximum number of scores to display
+            max_scores: Maximum number of scores to display (default: the pages revealed so far)
         """
         if not self.score_container:
             console.error(f"Score container not found with ID: {self.score_container_id}")
             return
         
-        # Clear the container
-        self.score_container.innerHTML = ""
-        
-        # Sort scores before displaying
-        self.sort_scores(self.current_sort_column, self.current_sort_direction)
+        # Read the visible rows straight from the server's page order or the sorted index
+        count = max_scores or self.visible_count
+        if self.paginated:
+            page = self.loaded_rows[:count]
+        else:
+            page = self.index.page(self.current_sort_column, self.current_sort_direction, 0, count)
         
-        if not self.scores or len(self.scores) == 0:
+        if not page:
             # No scores to display
-            row = document.createElement("tr")
-            cell = document.createElement("td")
-            cell.colSpan = 5
-            cell.style.textAlign = "center"
-            cell.textContent = "No high scores yet"
-            row.appendChild(cell)
-            self.score_container.appendChild(row)
-            return
+            rows = [(EMPTY_ROW_KEY, ("No high scores yet",))]
+        else:
+            rows = []
+            seen = {}
+            for score in page:
+                key = self.row_key(score)
+                # Identical scores get distinct keys by occurrence
+                occurrence = seen.get(key, 0)
+                seen[key] = occurrence + 1
+                rows.append(((key, occurrence) if occurrence else key, self.row_values(score)))
         
-        # Add score rows
-        for i, score in enumerate(self.scores[:max_scores]):
-            row = document.createElement("tr")
-            
-            # Name
-            name_cell = document.createElement("td")
-            name_cell.textContent = score.get("name", "Anonymous")
-            row.appendChild(name_cell)
+        self.patch_rows(rows)
+        self.update_sort_indicators()
+    
+    @staticmethod
+    def row_key(score):
+        """
+        Get the key identifying a score's table row across renders.
+        
+        Args:
+            score: Score object
             
-            # Score
-            score_cell = document.createElement("td")
-            score_cell.textContent = str(score.get("score", 0))
-            row.appendChild(score_cell)
+        Returns:
+            Hashable key for the row
+        """
+        if score.get("id") is not None:
+            return score["id"]
+        return (score.get("name"), score.get("score"), score.get("level"), score.get("lines"), score.get("date"))
+    
+    @staticmethod
+    def row_values(score):
+        """
+        Get the display text of each cell in a score's row.
+        
+        Args:
+            score: Score object
             
-            # Level
-            level_cell = document.createElement("td")
-            level_cell.textContent = str(score.get("level", 1))
-            row.appendChild(level_cell)
+        Returns:
+            tuple: Text for the name, score, level, lines and date cells
+        """
+        return (
+            score.get("name", "Anonymous"),
+            str(score.get("score", 0)),
+            str(score.get("level", 1)),
+            str(score.get("lines", 0)),
+            display_date(score),
+        )
+    
+    def create_row(self, key, values):
+        """
+        Create a table row for the given cell values.
+        
+        Args:
+            key: Row key
+            values: Text for each cell
             
-            # Lines
-            lines_cell = document.createElement("td")
-            lines_cell.textContent = str(score.get("lines", 0))
-            row.appendChild(lines_cell)
+        Returns:
+            list: [row element, cell elements, cell values]
+        """
+        row = document.createElement("tr")
+        cells = []
+        for value in values:
+            cell = document.createElement("td")
+            cell.textContent = value
+            row.appendChild(cell)
+            cells.append(cell)
+        
+        if key == EMPTY_ROW_KEY:
+            cells[0].colSpan = 5
+            cells[0].style.textAlign = "center"
+        
+        return [row, cells, values]
+    
+    def patch_rows(self, rows):
+        """
+        Bring the table body in line with the given rows.
+        
+        Args:
+            rows: List of (key, cell values) in display order
+        """
+        wanted = {key for key, _ in rows}
+        
+        # Remove rows that are no longer displayed
+        for key in [key for key in self.row_order if key not in wanted]:
+            self.row_nodes.pop(key)[0].remove()
+        current = [key for key in self.row_order if key in wanted]
+        
+        # Walk the target order, inserting runs of new or moved rows as one fragment
+        position = 0
+        fragment = None
+        for key, values in rows:
+            entry = self.row_nodes.get(key)
+            if entry is None:
+                entry = self.row_nodes[key] = self.create_row(key, values)
+            elif entry[2] != values:
+                # Update only the cells whose text changed
+                for cell, old, new in zip(entry[1], entry[2], values):
+                    if old != new:
+                        cell.textContent = new
+                entry[2] = values
             
-            # Date
-            date_cell = document.createElement("td")
-            date_cell.textContent = score.get("date", "N/A")
-            row.appendChild(date_cell)
+            if position < len(current) and current[position] == key:
+                # Already in place; flush any pending rows in front of it
+                if fragment is not None:
+                    self.score_container.insertBefore(fragment, entry[0])
+                    fragment = None
+                position += 1
+                continue
             
-            self.score_container.appendChild(row)
+            if key in current:
+                current.remove(key)
+            if fragment is None:
+                fragment = document.createDocumentFragment()
+            fragment.appendChild(entry[0])
         
-        # Set up sorting functionality
-        self.setup_sorting()
+        if fragment is not None:
+            reference = self.row_nodes[current[position]][0] if position < len(current) else None
+            self.score_container.insertBefore(fragment, reference)
+        
+        self.row_order = [key for key, _ in rows]
     
     def setup_sorting(self):
         """Set up sorting functionality for the high scores table."""
         # Find all sortable headers
-        headers = document.querySelectorAll("th[data-sort]")
+        self.sort_headers = list(document.querySelectorAll("th[data-sort]"))
         
         # Add click event listeners to headers
-        for header in headers:
+        for header in self.sort_headers:
             column = header.getAttribute("data-sort")
-            
-            # Add sort indicator if this is the current sort column
-            if column == self.current_sort_column:
-                header.className = f"sort-{self.current_sort_direction}"
-            
-            # Add click event for sorting (only if not already added)
-            if not hasattr(header, "_sort_listener_added"):
-                header._sort_listener_added = True
-                header.addEventListener("click", create_proxy(lambda event, col=column: self.handle_sort_click(col)))
+            proxy = create_proxy(lambda event, col=column: self.handle_sort_click(col))
+            self.sort_proxies.append(proxy)
+            header.addEventListener("click", proxy)
+        
+        self.update_sort_indicators()
+    
+    def update_sort_indicators(self):
+        """Show the sort direction on the current sort column's header."""
+        for header in self.sort_headers:
+            column = header.getAttribute("data-sort")
+            class_name = f"sort-{self.current_sort_direction}" if column == self.current_sort_column else ""
+            if header.className != class_name:
+                header.className = class_name
+    
+    def setup_views(self):
+        """Set up the buttons that switch between all scores and each player's best."""
+        # An empty data-view is the all-scores view
+        self.view_buttons = list(document.querySelectorAll("button[data-view]"))
+        
+        for button in self.view_buttons:
+            view = button.getAttribute("data-view") or None
+            proxy = create_proxy(lambda event, view=view: self.set_view(view))
+            self.view_proxies.append(proxy)
+            button.addEventListener("click", proxy)
+        
+        self.update_view_indicators()
+    
+    def update_view_indicators(self):
+        """Highlight the button of the current view."""
+        for button in self.view_buttons:
+            view = button.getAttribute("data-view") or None
+            button.classList.toggle("active", view == self.current_view)
     
     def handle_sort_click(self, column):
         """
@@ -257,7 +543,13 @@ class HighScoreManager:
         
         # Sort and update display
         self.sort_scores(column, new_direction)
-        self.display_scores()
+        if self.paginated:
+            # The server pages each order separately; fetch the new order's first page
+            self.loaded_etag = None
+            self.load_task = asyncio.ensure_future(self.load_scores())
+        else:
+            self.visible_count = PAGE_SIZE
+            self.display_scores()
     
     def prompt_for_name(self, score, level, lines):
         """
@@ -0,0 +1,262 @@
+"""
+Module containing perft: exhaustive placement counts for a position.
+Like perft in chess engines, it counts every distinct sequence of
+placements reachable to a given depth, which checks movement, rotation
+and wall kicks against known counts and times them in the same run.
+"""
+
+import argparse
+import json
+import time
+from collections import deque
+
+from tetris_board import Board
+from tetris_constants import COLS, GARBAGE_CELL, ROWS
+from tetris_piece import Piece
+
+# Piece letters in type order (index 0 is unused)
+PIECE_LETTERS = ".IJLOSTZ"
+
+# Every piece type and rotation, shared by all searches
+PIECES = tuple(
+    tuple(Piece(piece_type, rotation) for rotation in range(4)) if piece_type else ()
+    for piece_type in range(len(PIECE_LETTERS))
+)
+
+# Known positions and their counts at each depth, starting from depth 1.
+# Boards list rows from the top; "#" is a filled cell and missing rows
+# at the top are empty.
+REFERENCE_POSITIONS = [
+    {"name": "empty-i", "board": [], "pieces": "I", "counts": [17]},
+    {"name": "empty-o", "board": [], "pieces": "O", "counts": [9]},
+    {"name": "empty-t", "board": [], "pieces": "T", "counts": [34]},
+    {"name": "empty-s", "board": [], "pieces": "S", "counts": [17]},
+    {"name": "empty-z", "board": [], "pieces": "Z", "counts": [17]},
+    {"name": "empty-j", "board": [], "pieces": "J", "counts": [34]},
+    {"name": "empty-l", "board": [], "pieces": "L", "counts": [34]},
+    {"name": "empty-tio", "board": [], "pieces": "TIO", "counts": [34, 596, 5542]},
+    {
+        "name": "t-slot",
+        "board": [
+            "##.......#",
+            "#...######",
+            "##.#######",
+        ],
+        "pieces": "TSZ",
+        "counts": [36, 652, 11798],
+    },
+    {
+        "name": "well",
+        "board": [
+            "#########.",
+            "#########.",
+            "#########.",
+            "#########.",
+        ],
+        "pieces": "ILJ",
+        "counts": [17, 578, 20307],
+    },
+    {
+        "name": "garbage",
+        "board": [
+            "....##....",
+            "#.###.####",
+            "##.####.##",
+            "###.######",
+            "#.########",
+        ],
+        "pieces": "LJTS",
+        "counts": [34, 1187, 42719],
+    },
+]
+
+
+def parse_board(rows):
+    """
+    Build a board from text rows.
+
+    Args:
+        rows: Rows from the top, COLS characters each; "#" is filled and
+            any other character empty. Missing rows at the top are empty.
+
+    Returns:
+        Board: The board
+
+    Raises:
+        ValueError: If a row has the wrong width or there are too many rows
+    """
+    if len(rows) > ROWS:
+        raise ValueError(f"Expected at most {ROWS} rows, got {len(rows)}")
+    board = Board()
+    top = ROWS - len(rows)
+    for y, row in enumerate(rows, top):
+        if len(row) != COLS:
+            raise ValueError(f"Expected rows of {COLS} cells, got {row!r}")
+        for x, cell in enumerate(row):
+            if cell == "#":
+                board.cells[y * COLS + x] = GARBAGE_CELL
+    board.mark_dirty()
+    return board
+
+
+def parse_pieces(letters):
+    """Turn piece letters such as "TIO" into piece types."""
+    try:
+        return [PIECE_LETTERS.index(letter, 1) for letter in letters.upper()]
+    except ValueError:
+        raise ValueError(f"Unknown piece in {letters!r}; use {PIECE_LETTERS[1:]}") from None
+
+
+def placements(board, piece_type):
+    """
+    Find every distinct place a piece can lock from its spawn position.
+
+    Searches all positions reachable by moving left, right and down and
+    rotating either way with wall kicks. A position locks where the
+    piece cannot move down; positions filling the same cells (e.g. the
+    O piece in any rotation) count once.
+
+    Args:
+        board: Board to search
+        piece_type: Type of the piece
+
+    Returns:
+        list: (piece, x, y) for each distinct placement
+    """
+    is_valid = board.is_valid_position
+    rotations = PIECES[piece_type]
+    spawn = rotations[0]
+    x = (COLS - len(spawn.shape[0])) // 2
+    if not is_valid(spawn, x, 0):
+        return []
+
+    # Kick tests for each (rotation, turn), tried in order
+    kicks = [
+        [(target, piece.get_wall_kick_tests(rotation, target))
+         for target in ((rotation + 1) % 4, (rotation + 3) % 4)]
+        for rotation, piece in enumerate(rotations)
+    ]
+    fits = {}  # (rotation, x, y) -> bool, so each position is checked once
+
+    def valid(rotation, x, y):
+        key = (rotation, x, y)
+        result = fits.get(key)
+        if result is None:
+            result = fits[key] = is_valid(rotations[rotation], x, y)
+        return result
+
+    start = (0, x, 0)
+    seen = {start}
+    queue = deque((start,))
+    found = {}
+    while queue:
+        state = queue.popleft()
+        rotation, x, y = state
+        moves = [(rotation, x - 1, y), (rotation, x + 1, y)]
+        if valid(rotation, x, y + 1):
+            moves.append((rotation, x, y + 1))
+        else:
+            piece = rotations[rotation]
+            cells = frozenset([(x + dx, y + dy) for dx, dy in piece.cells])
+            if cells not in found:
+                found[cells] = (piece, x, y)
+
+        for target, tests in kicks[rotation]:
+            for kick_x, kick_y in tests:
+                # SRS offsets have y pointing up; board rows grow downwards
+                if valid(target, x + kick_x, y - kick_y):
+                    moves.append((target, x + kick_x, y - kick_y))
+                    break
+
+        for move in moves:
+            if move not in seen and valid(*move):
+                seen.add(move)
+                queue.append(move)
+    return list(found.values())
+
+
+def perft(board, pieces, depth, counts=None):
+    """
+    Count the placement sequences reachable in a position.
+
+    Args:
+        board: Board to start from (left unchanged)
+        pieces: Piece types to place, in order
+        depth: Number of pieces to place (at most len(pieces))
+        counts: Optional list of depth zeros; counts[d] is increased by
+            the number of sequences of length d + 1, so one call counts
+            every depth up to depth
+
+    Returns:
+        int: Number of distinct placement sequences of that length
+    """
+    if depth == 0:
+        return 1
+    moves = placements(board, pieces[0])
+    if counts is not None:
+        counts[len(counts) - depth] += len(moves)
+    if depth == 1:
+        return len(moves)
+
+    cells = board.cells
+    saved = bytes(cells)
+    lines = board.lines_cleared
+    total = 0
+    for piece, x, y in moves:
+        board.place_piece(piece, x, y)
+        board.check_lines(y, y + len(piece.shape) - 1)
+        total += perft(board, pieces[1:], depth - 1, counts)
+        cells[:] = saved
+    board.lines_cleared = lines
+    board.mark_dirty()
+    return total
+
+
+def run_position(position, depth=None):
+    """
+    Run perft on a reference position.
+
+    Args:
+        position: Entry of REFERENCE_POSITIONS
+        depth: Depth to run to (default: every depth with a known count)
+
+    Returns:
+        dict: Counts per depth, whether they match, nodes and timing
+    """
+    board = parse_board(position["board"])
+    pieces = parse_pieces(position["pieces"])
+    expected = position["counts"]
+    depth = min(depth or len(expected) or len(pieces), len(pieces))
+    counts = [0] * depth
+    start = time.perf_counter()
+    perft(board, pieces, depth, counts)
+    elapsed = time.perf_counter() - start
+    return {
+        "counts": counts,
+        "ok": counts[:len(expected)] == expected[:len(counts)],
+        "nodes": sum(counts),
+        "seconds": round(elapsed, 4),
+    }
+
+
+def main(argv=None):
+    """Run perft on the reference corpus or a position from the command line."""
+    parser = argparse.ArgumentParser(description="Count reachable Tetris placement sequences")
+    parser.add_argument("--pieces", help="Piece letters, e.g. TIO (default: run the reference corpus)")
+    parser.add_argument("--board", nargs="*", default=[], help="Board rows from the top, '#' for filled")
+    parser.add_argument("--depth", type=int, help="Depth (default: number of pieces)")
+    args = parser.parse_args(argv)
+
+    positions = REFERENCE_POSITIONS
+    if args.pieces:
+        positions = [{"name": "custom", "board": args.board, "pieces": args.pieces, "counts": []}]
+    failed = False
+    for position in positions:
+        result = run_position(position, args.depth)
+        failed = failed or not result["ok"]
+        print(json.dumps({"name": position["name"], **result}))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
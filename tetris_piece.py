@@ -1,109 +1,156 @@
 from tetris_constants import SHAPES
 import random
 
+
+def _rotate_clockwise(shape):
+    """Return a copy of a shape matrix rotated 90 degrees clockwise."""
+    rows = len(shape)
+    cols = len(shape[0])
+    return tuple(
+        tuple(shape[rows - 1 - r][c] for r in range(rows))
+        for c in range(cols)
+    )
+
+
+def _build_rotations():
+    """
+    Precompute every rotation state of every piece.
+
+    Returns:
+        tuple: (ROTATIONS, CELLS) indexed by [piece_type][rotation]. ROTATIONS
+        holds the shape matrices, CELLS the (x, y) offsets of filled blocks.
+    """
+    rotations = [()]
+    cells = [()]
+    for piece_type in range(1, len(SHAPES)):
+        shape = tuple(tuple(row) for row in SHAPES[piece_type])
+        states = []
+        for _ in range(4):
+            states.append(shape)
+            # O piece (square) does not change when rotated
+            if piece_type != 4:
+                shape = _rotate_clockwise(shape)
+        rotations.append(tuple(states))
+        cells.append(tuple(
+            tuple((x, y) for y, row in enumerate(state) for x, cell in enumerate(row) if cell)
+            for state in states
+        ))
+    return tuple(rotations), tuple(cells)
+
+
+ROTATIONS, CELLS = _build_rotations()
+
+# SRS (Super Rotation System) wall kick offsets, (x, y) with y pointing up
+I_WALL_KICKS = (
+    ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),  # 0->1
+    ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),  # 1->2
+    ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),  # 2->3
+    ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),  # 3->0
+)
+JLSTZ_WALL_KICKS = (
+    ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),  # 0->1
+    ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),      # 1->2
+    ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),     # 2->3
+    ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),   # 3->0
+)
+
+# Rotation transition -> wall kick table row
+KICK_INDEX = {
+    (0, 1): 0, (2, 3): 0,
+    (1, 2): 1, (3, 0): 1,
+    (2, 1): 2, (0, 3): 2,
+    (3, 2): 3, (1, 0): 3,
+}
+
+
 class Piece:
     """
     Represents a Tetris piece (tetromino).
     Handles piece generation, rotation, and movement.
     """
-    
-    def __init__(self, piece_type=None):
+
+    __slots__ = ("type", "rotation", "shape", "cells")
+
+    def __init__(self, piece_type=None, rotation=0):
         """
         Initialize a new tetromino piece.
-        
+
         Args:
             piece_type: Type index of the piece (1-7), or None for random
+            rotation: Initial rotation state (0-3)
         """
         self.type = piece_type if piece_type is not None else self.random_piece_type()
-        self.shape = SHAPES[self.type]
-        self.rotation = 0  # Current rotation state (0, 1, 2, 3)
-    
+        self.rotation = rotation % 4  # Current rotation state (0, 1, 2, 3)
+        self.shape = ROTATIONS[self.type][self.rotation]
+        self.cells = CELLS[self.type][self.rotation]
+
     @staticmethod
-    def random_piece_type():
-        """Generate a random piece type (1-7)."""
-        return random.randint(1, 7)
-    
+    def random_piece_type(rng=None):
+        """
+        Generate a random piece type (1-7).
+
+        Args:
+            rng: random.Random instance to draw from (default: module RNG)
+        """
+        return (rng or random).randint(1, 7)
+
+    @classmethod
+    def generate_random(cls, rng=None):
+        """
+        Create a piece of random type.
+
+        Args:
+            rng: random.Random instance to draw from (default: module RNG)
+
+        Returns:
+            Piece: The new piece
+        """
+        return cls(cls.random_piece_type(rng))
+
     def rotate(self, clockwise=True):
         """
         Rotate the piece.
-        
+
         Args:
             clockwise: True for clockwise rotation, False for counterclockwise
-            
+
         Returns:
-            list: The rotated shape
+            tuple: The rotated shape
         """
-        # Special case for O piece (square) - no rotation needed
-        if self.type == 4:  # O piece
-            return self.shape
-        
-        # Get current shape
-        current = self.shape
-        
-        # Calculate new dimensions
-        rows = len(current)
-        cols = len(current[0])
-        
-        # Create a new matrix for the rotated shape
-        rotated = [[0 for _ in range(rows)] for _ in range(cols)]
-        
-        if clockwise:
-            # Clockwise rotation
-            for r in range(rows):
-                for c in range(cols):
-                    rotated[c][rows - 1 - r] = current[r][c]
-        else:
-            # Counter-clockwise rotation
-            for r in range(rows):
-                for c in range(cols):
-                    rotated[cols - 1 - c][r] = current[r][c]
-        
-        # Update shape and rotation state
-        self.shape = rotated
         self.rotation = (self.rotation + (1 if clockwise else 3)) % 4
-        
+        self.shape = ROTATIONS[self.type][self.rotation]
+        self.cells = CELLS[self.type][self.rotation]
         return self.shape
-    
+
+    def get_rotated(self, clockwise=True):
+        """
+        Get a rotated copy of the piece without modifying this one.
+
+        Args:
+            clockwise: True for clockwise rotation, False for counterclockwise
+
+        Returns:
+            Piece: The rotated piece
+        """
+        return Piece(self.type, self.rotation + (1 if clockwise else 3))
+
     def get_wall_kick_tests(self, prev_rotation, new_rotation):
         """
         Get wall kick test offsets for rotation.
         These are the standard SRS (Super Rotation System) offsets.
-        
+
         Args:
             prev_rotation: Previous rotation state (0-3)
             new_rotation: New rotation state (0-3)
-            
+
         Returns:
-            list: List of (x, y) offset pairs to test
+            tuple: Sequence of (x, y) offset pairs to test
         """
+        index = KICK_INDEX.get((prev_rotation, new_rotation))
+        if index is None:
+            return ((0, 0),)
+
         # I piece has different wall kick data
         if self.type == 1:  # I piece
-            # I piece wall kick data (SRS)
-            wall_kicks = [
-                [(0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)],  # 0->1
-                [(0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)],  # 1->2
-                [(0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)],  # 2->3
-                [(0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)]   # 3->0
-            ]
-        else:
-            # Wall kick data for J, L, S, T, Z pieces (SRS)
-            wall_kicks = [
-                [(0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)],  # 0->1
-                [(0, 0), (1, 0), (1, -1), (0, 2), (1, 2)],      # 1->2
-                [(0, 0), (1, 0), (1, 1), (0, -2), (1, -2)],     # 2->3
-                [(0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)]    # 3->0
-            ]
-        
-        # Calculate the rotation transition index
-        transition = (prev_rotation, new_rotation)
-        if transition == (0, 1) or transition == (2, 3):
-            return wall_kicks[0]
-        elif transition == (1, 2) or transition == (3, 0):
-            return wall_kicks[1]
-        elif transition == (2, 1) or transition == (0, 3):
-            return wall_kicks[2]
-        elif transition == (3, 2) or transition == (1, 0):
-            return wall_kicks[3]
-        
-        # Default case
-        return [(0, 0)]
+            return I_WALL_KICKS[index]
+        return JLSTZ_WALL_KICKS[index]
@@ -0,0 +1,303 @@
+"""
+Module containing the server-side leaderboard indexes.
+Ranks, day and week leaderboards and per-player bests, kept up to date
+as scores are stored. Only the server uses these, so they are kept out
+of tetris_scores, which is shipped to the browser.
+"""
+
+import heapq
+import itertools
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+
+# Score range counted together by one RankIndex bucket
+RANK_BUCKET_WIDTH = 1024
+
+# Scores from here up share RankIndex's top bucket, which bounds its tree
+RANK_MAX_SCORE = 10 ** 8
+
+# Seconds per leaderboard day bucket (UTC days)
+DAY_SECONDS = 86400
+
+# Time-windowed leaderboards and the number of days each covers
+WINDOWS = {"day": 1, "week": 7}
+
+# Days ahead of the server clock a score may be dated, for client clock
+# skew; such scores count as today's
+FUTURE_DAYS = 1
+
+# Recent games remembered per player
+PLAYER_HISTORY = 10
+
+
+def player_key(name):
+    """Normalize a player name for grouping: trimmed, case-insensitive."""
+    return " ".join(str(name or "Anonymous").split()).casefold()
+
+
+class RankIndex:
+    """
+    Answers "what place is this score?" in O(log n).
+
+    Scores are grouped into fixed-width buckets. A Fenwick tree counts the
+    scores per bucket, and each bucket keeps its own small sorted list, so
+    a rank is a prefix sum plus one bisect, and an insert updates one
+    bucket and O(log buckets) tree nodes. The tree doubles in size when a
+    score lands beyond its range, up to the top bucket: every score from
+    max_score up is counted there, so no score can make the tree larger
+    than max_score / bucket_width, and ranks stay exact.
+    """
+
+    def __init__(self, scores=(), bucket_width=RANK_BUCKET_WIDTH, max_score=RANK_MAX_SCORE):
+        """
+        Initialize the index.
+
+        Args:
+            scores: Initial score values
+            bucket_width: Range of score values per bucket
+            max_score: Lowest score value counted in the top bucket
+        """
+        self.bucket_width = bucket_width
+        self.top_bucket = max_score // bucket_width
+        self.buckets = {}
+        self.tree = [0] * 2  # Fenwick tree over buckets, 1-based
+        self.total = 0
+        for score in scores:
+            self.add(score)
+
+    def __len__(self):
+        return self.total
+
+    def bucket_of(self, score):
+        """Return the bucket number of a score value."""
+        return min(max(int(score), 0) // self.bucket_width, self.top_bucket)
+
+    def grow(self, bucket):
+        """Enlarge the tree until it can hold the given bucket."""
+        size = len(self.tree) - 1
+        while bucket >= size:
+            size *= 2
+        tree = [0] * (size + 1)
+        for number, values in self.buckets.items():
+            tree[number + 1] = len(values)
+        # Build the Fenwick tree from per-bucket counts in O(size)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, score):
+        """
+        Insert a score value.
+
+        Args:
+            score: Score value
+        """
+        score = max(int(score), 0)
+        bucket = self.bucket_of(score)
+        if bucket >= len(self.tree) - 1:
+            self.grow(bucket)
+        insort(self.buckets.setdefault(bucket, []), score)
+        self.total += 1
+
+        tree = self.tree
+        size = len(tree) - 1
+        i = bucket + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+
+    def count_through(self, bucket):
+        """Return the number of scores in buckets 0 through bucket."""
+        tree = self.tree
+        i = min(bucket + 1, len(tree) - 1)
+        count = 0
+        while i > 0:
+            count += tree[i]
+            i -= i & -i
+        return count
+
+    def count_above(self, score):
+        """
+        Count the stored scores strictly greater than a value.
+
+        Args:
+            score: Score value
+
+        Returns:
+            int: Number of higher scores
+        """
+        score = max(int(score), 0)
+        bucket = self.bucket_of(score)
+        values = self.buckets.get(bucket, ())
+        return self.total - self.count_through(bucket) + len(values) - bisect_right(values, score)
+
+    def rank(self, score):
+        """
+        Get the leaderboard place a score would have; ties share a place.
+
+        Args:
+            score: Score value
+
+        Returns:
+            int: 1 for the best score
+        """
+        return self.count_above(score) + 1
+
+
+class WindowedLeaderboard:
+    """
+    Keeps daily and weekly top scores without rescanning history.
+
+    Scores are grouped into per-day buckets that each keep only their
+    best top_k entries, updated on insert. A window query merges the
+    buckets it covers, so it costs O(top_k * log buckets) however many
+    scores were stored. Buckets that fall out of the longest window are
+    dropped lazily on the next insert or query. Scores dated up to
+    FUTURE_DAYS ahead count as today's; later ones are ignored, so a bad
+    date cannot pin a score to the boards.
+    """
+
+    def __init__(self, top_k=100, windows=WINDOWS, clock=None):
+        """
+        Initialize the leaderboard.
+
+        Args:
+            top_k: Entries kept per bucket; the largest page a window can serve
+            windows: Window name to number of days
+            clock: Function returning the current epoch seconds
+        """
+        self.top_k = top_k
+        self.windows = dict(windows)
+        self.retention = max(self.windows.values(), default=1)
+        self.clock = clock or time.time
+        self.buckets = {}
+        self.days = []  # Sorted bucket days, oldest first
+
+    def today(self):
+        """Return the current day number."""
+        return int(self.clock()) // DAY_SECONDS
+
+    def expire(self, today):
+        """Drop the buckets older than the longest window."""
+        oldest = today - self.retention + 1
+        while self.days and self.days[0] < oldest:
+            del self.buckets[self.days.pop(0)]
+
+    def add(self, epoch, score, seq):
+        """
+        Count a score in its day's bucket.
+
+        Args:
+            epoch: Score date as epoch seconds; undated scores and scores
+                dated more than FUTURE_DAYS ahead are ignored
+            score: Score value
+            seq: Position of the score in the store
+        """
+        if epoch <= 0:
+            return
+        day = epoch // DAY_SECONDS
+        today = self.today()
+        self.expire(today)
+        if not today - self.retention + 1 <= day <= today + FUTURE_DAYS:
+            return
+        day = min(day, today)
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = []
+            insort(self.days, day)
+        entry = (-int(score), seq)
+        if len(bucket) < self.top_k:
+            insort(bucket, entry)
+        elif entry < bucket[-1]:
+            insort(bucket, entry)
+            bucket.pop()
+
+    def top(self, window, count=10):
+        """
+        Get the best scores of a window.
+
+        Args:
+            window: Window name (see WINDOWS)
+            count: Maximum number of entries, at most top_k
+
+        Returns:
+            list: Store positions of the best scores, highest first
+
+        Raises:
+            KeyError: If the window is unknown
+        """
+        today = self.today()
+        self.expire(today)
+        first = today - self.windows[window] + 1
+        days = self.days[bisect_left(self.days, first):bisect_right(self.days, today)]
+        buckets = [self.buckets[day] for day in days]
+        merged = heapq.merge(*buckets)
+        return [seq for _, seq in itertools.islice(merged, min(count, self.top_k))]
+
+
+class PlayerIndex:
+    """
+    Keeps each player's best score and recent games.
+
+    Players are grouped by normalized name (see player_key). Every player
+    has their best score's position and a bounded list of their latest
+    positions, and a list of (-best, player) pairs keeps players ordered
+    by best score for the "best per player" view. Inserts update one
+    player; lookups never scan the scores.
+    """
+
+    def __init__(self, history=PLAYER_HISTORY):
+        """
+        Initialize the index.
+
+        Args:
+            history: Number of recent games kept per player
+        """
+        self.history = history
+        self.best = {}  # player -> (score, seq)
+        self.recent = {}  # player -> deque of seq, newest last
+        self.ranking = []  # sorted (-best score, first seq, player)
+
+    def __len__(self):
+        return len(self.best)
+
+    def add(self, name, score, seq):
+        """
+        Record a game.
+
+        Args:
+            name: Player name as entered
+            score: Score value
+            seq: Position of the score in the store
+        """
+        player = player_key(name)
+        score = int(score or 0)
+        recent = self.recent.get(player)
+        if recent is None:
+            recent = self.recent[player] = deque(maxlen=self.history)
+        recent.append(seq)
+
+        best = self.best.get(player)
+        if best is not None:
+            if score <= best[0]:
+                return
+            del self.ranking[bisect_left(self.ranking, (-best[0], best[1], player))]
+        self.best[player] = (score, seq)
+        insort(self.ranking, (-score, seq, player))
+
+    def best_of(self, name):
+        """Return the position of a player's best score, or None."""
+        best = self.best.get(player_key(name))
+        return None if best is None else best[1]
+
+    def recent_of(self, name, count=None):
+        """Return the positions of a player's latest games, newest first."""
+        recent = self.recent.get(player_key(name), ())
+        return list(recent)[::-1][:count]
+
+    def top(self, start=0, count=10):
+        """Return the positions of each player's best score, best players first."""
+        return [seq for _, seq, _ in self.ranking[start:start + count]]
@@ -1,4 +1,4 @@
-from tetris_constants import COLORS, BLOCK_SIZE
+from tetris_constants import COLORS, BLOCK_SIZE, COLS, PREVIEW_BLOCK_SIZE
 
 class Renderer:
     """
@@ -66,15 +66,14 @@ class Renderer:
         Draw the game board.
         
         Args:
-            board: 2D array representing the game board
+            board: The Board instance to draw
         """
         self.clear_canvas()
         
         # Draw the grid
-        for y in range(len(board)):
-            for x in range(len(board[y])):
-                if board[y][x]:
-                    self.draw_block(x, y, board[y][x])
+        for i, cell in enumerate(board.cells):
+            if cell:
+                self.draw_block(i % COLS, i // COLS, cell)
     
     def draw_piece(self, piece, x, y):
         """
@@ -85,10 +84,8 @@ class Renderer:
             x: X coordinate of the piece
             y: Y coordinate of the piece
         """
-        for row_idx, row in enumerate(piece.shape):
-            for col_idx, cell in enumerate(row):
-                if cell:
-                    self.draw_block(x + col_idx, y + row_idx, piece.type)
+        for dx, dy in piece.cells:
+            self.draw_block(x + dx, y + dy, piece.type)
     
     def draw_next_piece(self, piece):
         """
@@ -100,7 +97,7 @@ class Renderer:
         self.clear_next_canvas()
         
         # Use smaller blocks for the preview
-        block_size = 20
+        block_size = PREVIEW_BLOCK_SIZE
         
         # Center the piece in the canvas
         shape = piece.shape
@@ -108,24 +105,22 @@ class Renderer:
         offset_y = (self.next_canvas.height - len(shape) * block_size) / 2
         
         # Draw each block of the piece
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    # Draw directly with pixel coordinates
-                    self.next_ctx.fillStyle = COLORS[piece.type]
-                    self.next_ctx.fillRect(
-                        offset_x + x * block_size,
-                        offset_y + y * block_size,
-                        block_size,
-                        block_size
-                    )
-                    self.next_ctx.strokeStyle = "#FFFFFF"
-                    self.next_ctx.strokeRect(
-                        offset_x + x * block_size,
-                        offset_y + y * block_size,
-                        block_size,
-                        block_size
-                    )
+        for x, y in piece.cells:
+            # Draw directly with pixel coordinates
+            self.next_ctx.fillStyle = COLORS[piece.type]
+            self.next_ctx.fillRect(
+                offset_x + x * block_size,
+                offset_y + y * block_size,
+                block_size,
+                block_size
+            )
+            self.next_ctx.strokeStyle = "#FFFFFF"
+            self.next_ctx.strokeRect(
+                offset_x + x * block_size,
+                offset_y + y * block_size,
+                block_size,
+                block_size
+            )
     
     def draw_game_over(self):
         """Draw the game over screen."""
@@ -144,6 +139,20 @@ class Renderer:
         self.ctx.font = "24px Arial"
         self.ctx.fillText("Press S to play again", self.canvas.width / 2, self.canvas.height / 2 + 24)
     
+    def draw_game_over_screen(self, score, level, lines):
+        """
+        Draw the game over screen with the final stats.
+        
+        Args:
+            score: Final score
+            level: Final level
+            lines: Total lines cleared
+        """
+        self.draw_game_over()
+        
+        self.ctx.font = "16px Arial"
+        self.ctx.fillText(f"Score: {score}  Level: {level}  Lines: {lines}", self.canvas.width / 2, self.canvas.height / 2 + 60)
+    
     def draw_pause_screen(self):
         """Draw the pause screen."""
         # Semi-transparent overlay
@@ -0,0 +1,166 @@
+"""
+Module containing rollback netcode for battle matches.
+Each peer simulates both players at once. Remote inputs that have not
+arrived yet are predicted to be empty; when the real ones arrive and
+differ, the peer rewinds to a saved snapshot and resimulates up to the
+current frame.
+
+Peers exchange (frame, actions) pairs: every frame a peer sends the
+local inputs it scheduled for frame + input_delay, even when empty, so
+the other side can confirm that frame.
+"""
+
+import time
+
+from tetris_battle import MAX_INPUTS_PER_TICK, TICK_RATE, BattleMatch, valid_actions
+
+# Frames between a key press and its effect; hides that much latency
+INPUT_DELAY = 2
+
+# Frames the simulation may run ahead of the last confirmed remote input
+ROLLBACK_WINDOW = 8
+
+# Milliseconds of resimulation allowed per advance() before it yields
+RESIMULATION_BUDGET_MS = 4.0
+
+NO_INPUT = ()
+
+
+class RollbackSession:
+    """
+    One peer's side of a match with rollback.
+
+    Before simulating frame f, the match state is saved in a ring buffer
+    of ROLLBACK_WINDOW + 1 snapshots. The session never runs more than
+    the window ahead of the confirmed remote inputs, so the frame a
+    misprediction sends it back to is always still in the ring.
+    """
+
+    def __init__(self, seed, local_player, input_delay=INPUT_DELAY, window=ROLLBACK_WINDOW,
+                 budget_ms=RESIMULATION_BUDGET_MS, tick_rate=TICK_RATE):
+        """
+        Initialize the session.
+
+        Args:
+            seed: Match seed, the same on both peers
+            local_player: 0 or 1
+            input_delay: Frames local inputs are delayed by
+            window: Frames the session may predict ahead
+            budget_ms: Resimulation time allowed per advance()
+            tick_rate: Simulation ticks per second
+        """
+        self.match = BattleMatch(None, seed, tick_rate)
+        self.local = local_player
+        self.remote = 1 - local_player
+        self.input_delay = input_delay
+        self.window = window
+        self.budget = budget_ms / 1000
+        self.states = [None] * (window + 1)
+        self.frame = 0  # Next frame to run
+        self.position = 0  # Next frame the match itself will simulate
+        # Nobody can press anything before the input delay has passed
+        self.confirmed = input_delay
+        self.local_inputs = {}  # frame -> list of actions
+        self.remote_inputs = {}  # frame -> confirmed actions
+        self.used = {}  # frame -> remote actions the last simulation of it used
+        self.rollback_from = None
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.stalls = 0
+        self.max_resimulation = 0.0
+
+    def add_local_input(self, action):
+        """
+        Schedule a local input for input_delay frames from now.
+
+        Args:
+            action: Name from tetris_battle.ACTIONS
+
+        Returns:
+            bool: False if that frame already has MAX_INPUTS_PER_TICK inputs
+        """
+        actions = self.local_inputs.setdefault(self.frame + self.input_delay, [])
+        if len(actions) >= MAX_INPUTS_PER_TICK:
+            return False
+        actions.append(action)
+        return True
+
+    def add_remote_input(self, frame, actions):
+        """
+        Record the remote player's inputs for a frame.
+
+        Args:
+            frame: Frame the inputs apply to
+            actions: Actions for that frame; unknown ones are dropped and
+                at most MAX_INPUTS_PER_TICK are kept
+        """
+        if not isinstance(frame, int) or frame < self.confirmed or frame in self.remote_inputs:
+            return
+        actions = valid_actions(actions)
+        self.remote_inputs[frame] = actions
+        while self.confirmed in self.remote_inputs:
+            self.confirmed += 1
+
+        # A frame already simulated with a wrong guess must be redone
+        if frame < self.position and self.used.get(frame, NO_INPUT) != actions:
+            if self.rollback_from is None or frame < self.rollback_from:
+                self.rollback_from = frame
+
+    def simulate(self, frame):
+        """Save the state before a frame, then simulate it."""
+        self.states[frame % len(self.states)] = self.match.snapshot()
+        remote = self.remote_inputs.get(frame, NO_INPUT)
+        self.used[frame] = remote
+        inputs = [None, None]
+        inputs[self.local] = self.local_inputs.get(frame, NO_INPUT)
+        inputs[self.remote] = remote
+        self.match.step(inputs)
+        self.position = frame + 1
+
+    def advance(self):
+        """
+        Run one frame: correct any misprediction, then step forward.
+
+        Resimulation stops when the time budget runs out and continues on
+        the next call; the session does not step forward until it has
+        caught up, nor while it is a full window ahead of the remote
+        player.
+
+        Returns:
+            tuple: (frame, actions) of local inputs to send to the peer,
+            or None if the session did not step this call
+        """
+        start = time.perf_counter()
+        if self.rollback_from is not None:
+            self.match.restore(self.states[self.rollback_from % len(self.states)])
+            self.position = self.rollback_from
+            self.rollback_from = None
+            self.rollbacks += 1
+
+        resimulated = 0
+        while self.position < self.frame:
+            if resimulated and time.perf_counter() - start > self.budget:
+                break
+            self.simulate(self.position)
+            resimulated += 1
+        if resimulated:
+            self.resimulated += resimulated
+            self.max_resimulation = max(self.max_resimulation, time.perf_counter() - start)
+        if self.position < self.frame:
+            return None
+        if self.frame - self.confirmed >= self.window:
+            self.stalls += 1
+            return None
+
+        frame = self.frame
+        self.simulate(frame)
+        self.frame = frame + 1
+
+        # Frames before the window can no longer be rolled back to
+        old = frame - self.window - 1
+        self.local_inputs.pop(old, None)
+        self.remote_inputs.pop(old, None)
+        self.used.pop(old, None)
+
+        send = frame + self.input_delay
+        return send, tuple(self.local_inputs.get(send, NO_INPUT))
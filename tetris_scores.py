@@ -0,0 +1,344 @@
+"""
+Module containing the high score data structures.
+Provides sorted per-column indexes over a leaderboard.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import accumulate
+
+# Entries per SortedColumn block; a block is split in two when it grows past this
+COLUMN_BLOCK_SIZE = 1024
+
+# Columns the high score table can be sorted by
+SORT_COLUMNS = ("name", "score", "level", "lines", "date")
+NUMERIC_COLUMNS = ("score", "level", "lines")
+
+# Non-ISO date formats found in stored scores, e.g. "5/19/2025, 3:40:44 PM"
+DATE_FORMATS = (
+    "%m/%d/%Y, %I:%M:%S %p",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y, %H:%M:%S",
+    "%m/%d/%Y",
+)
+
+# Range of epoch seconds a date may have: years 1 through 9999, the
+# dates datetime can represent
+MIN_EPOCH = -62135596800
+MAX_EPOCH = 253402300799
+
+
+def sort_key(score, column):
+    """
+    Get the value a score is ordered by for a column.
+
+    Args:
+        score: Score object
+        column: Column name (name, score, level, lines, date)
+
+    Returns:
+        The comparable sort key
+    """
+    if column == "name":
+        return (score.get("name") or "Anonymous").lower()
+    elif column in NUMERIC_COLUMNS:
+        return int(score.get(column) or (1 if column == "level" else 0))
+    elif column == "date":
+        return date_to_epoch(score.get("date"))
+    return 0
+
+
+@lru_cache(maxsize=4096)
+def date_to_epoch(text):
+    """
+    Convert a stored score date to epoch seconds.
+
+    Accepts ISO dates and date-times ("2025-05-19", "2025-05-19T15:40:44Z"),
+    the US locale format written by older clients ("5/19/2025, 3:40:44 PM")
+    and epoch seconds, as numbers or numeric strings. Dates without a time
+    zone are taken as UTC. Results are cached, since many scores share a
+    date.
+
+    Args:
+        text: Date string or number
+
+    Returns:
+        int: Seconds since the epoch, or 0 if the date cannot be parsed or
+            is outside MIN_EPOCH..MAX_EPOCH
+    """
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return bounded_epoch(text)
+    text = str(text or "").strip()
+    if not text:
+        return 0
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        for date_format in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(text, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            try:
+                return bounded_epoch(float(text))
+            except ValueError:
+                return 0
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def bounded_epoch(value):
+    """Return a number of epoch seconds as an int, or 0 if it is out of range or NaN."""
+    if not MIN_EPOCH <= value <= MAX_EPOCH:
+        return 0
+    return int(value)
+
+
+@lru_cache(maxsize=4096)
+def format_date(epoch):
+    """
+    Format epoch seconds for display, independent of the browser locale.
+
+    Args:
+        epoch: Seconds since the epoch, 0 for an unknown date
+
+    Returns:
+        str: "YYYY-MM-DD", with " HH:MM" (UTC) added when the time is known,
+            or "N/A" for an unknown or unrepresentable date
+    """
+    if not epoch:
+        return "N/A"
+    try:
+        moment = datetime.fromtimestamp(epoch, timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return "N/A"
+    if moment.hour == moment.minute == moment.second == 0:
+        return moment.strftime("%Y-%m-%d")
+    return moment.strftime("%Y-%m-%d %H:%M")
+
+
+def display_date(score):
+    """Return the display text for a score's date."""
+    return format_date(date_to_epoch(score.get("date")))
+
+
+class SortedColumn:
+    """
+    A sorted list stored as consecutive blocks of at most COLUMN_BLOCK_SIZE.
+
+    An insert bisects the blocks' last entries to find its block and only
+    shifts that block, so it costs O(log n + COLUMN_BLOCK_SIZE) instead of
+    moving half of one long list. Positions are found through the blocks'
+    start offsets, rebuilt on the first read after an insert.
+    """
+
+    def __init__(self, entries=()):
+        """
+        Initialize the column.
+
+        Args:
+            entries: Entries, already sorted
+        """
+        entries = list(entries)
+        half = COLUMN_BLOCK_SIZE // 2
+        self.blocks = [entries[start:start + half] for start in range(0, len(entries), half)]
+        self.maxes = [block[-1] for block in self.blocks]
+        self.size = len(entries)
+        self.starts = None
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, entry):
+        """Insert an entry in order."""
+        blocks = self.blocks
+        self.size += 1
+        self.starts = None
+        if not blocks:
+            blocks.append([entry])
+            self.maxes.append(entry)
+            return
+        number = bisect_left(self.maxes, entry)
+        if number == len(blocks):
+            number -= 1
+            blocks[number].append(entry)
+            self.maxes[number] = entry
+        else:
+            insort(blocks[number], entry)
+        block = blocks[number]
+        if len(block) > COLUMN_BLOCK_SIZE:
+            half = len(block) // 2
+            blocks.insert(number + 1, block[half:])
+            del block[half:]
+            self.maxes.insert(number, block[-1])
+
+    def block_starts(self):
+        """Return the position of each block's first entry."""
+        if self.starts is None:
+            self.starts = [0, *accumulate(len(block) for block in self.blocks)][:-1] if self.blocks else []
+        return self.starts
+
+    def bisect_left(self, entry):
+        """Return the position of the first entry not less than entry."""
+        number = bisect_left(self.maxes, entry)
+        if number == len(self.blocks):
+            return self.size
+        return self.block_starts()[number] + bisect_left(self.blocks[number], entry)
+
+    def bisect_right(self, entry):
+        """Return the position after the last entry not greater than entry."""
+        number = bisect_right(self.maxes, entry)
+        if number == len(self.blocks):
+            return self.size
+        return self.block_starts()[number] + bisect_right(self.blocks[number], entry)
+
+    def slice(self, start, stop):
+        """
+        Get the entries between two positions.
+
+        Args:
+            start: Position of the first entry
+            stop: Position after the last entry
+
+        Returns:
+            list: The entries, in order
+        """
+        start = max(start, 0)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+        starts = self.block_starts()
+        number = bisect_right(starts, start) - 1
+        offset = start - starts[number]
+        selected = []
+        while len(selected) < stop - start:
+            selected.extend(self.blocks[number][offset:offset + stop - start - len(selected)])
+            number += 1
+            offset = 0
+        return selected
+
+
+class ScoreIndex:
+    """
+    Keeps a leaderboard sorted by every sortable column at once.
+
+    Each column holds (sort key, sequence) pairs kept in order in a
+    SortedColumn, with keys computed once per score. Inserting bisects
+    into each column; reading a page slices the column forwards or
+    backwards, so changing the sort column or direction never re-sorts.
+    """
+
+    def __init__(self, scores=()):
+        """
+        Initialize the index.
+
+        Args:
+            scores: Initial score objects
+        """
+        self.reset(scores)
+
+    def reset(self, scores=()):
+        """
+        Replace the indexed scores, sorting each column once.
+
+        Args:
+            scores: Score objects to index
+        """
+        self.scores = list(scores)
+
+        # Extract each column's keys in one pass instead of calling sort_key
+        # per score; dates are parsed once here, so the date column sorts ints
+        scores = self.scores
+        columns = {
+            "name": [(score.get("name") or "Anonymous").lower() for score in scores],
+            "score": [int(score.get("score") or 0) for score in scores],
+            "level": [int(score.get("level") or 1) for score in scores],
+            "lines": [int(score.get("lines") or 0) for score in scores],
+            "date": [date_to_epoch(score.get("date")) for score in scores],
+        }
+        self.columns = {
+            column: SortedColumn(sorted(zip(columns[column], range(len(scores)))))
+            for column in SORT_COLUMNS
+        }
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, score):
+        """
+        Insert a score into every column index.
+
+        Args:
+            score: Score object to insert
+        """
+        seq = len(self.scores)
+        self.scores.append(score)
+        for column, entries in self.columns.items():
+            entries.insert((sort_key(score, column), seq))
+
+    def page(self, column, direction="desc", start=0, count=10):
+        """
+        Get a page of scores in sorted order.
+
+        Args:
+            column: Column to sort by
+            direction: Sort direction (asc, desc)
+            start: Index of the first score to return
+            count: Maximum number of scores to return
+
+        Returns:
+            list: Score objects in display order
+        """
+        entries = self.columns[column]
+        if direction == "desc":
+            end = len(entries) - start
+            selected = entries.slice(end - count, end)[::-1]
+        else:
+            selected = entries.slice(start, start + count)
+        scores = self.scores
+        return [scores[seq] for _, seq in selected]
+
+    def seek(self, column, direction="desc", after=None, count=10, low=None, high=None):
+        """
+        Get the index entries that follow a keyset position.
+
+        Args:
+            column: Column to sort by
+            direction: Sort direction (asc, desc)
+            after: (sort key, sequence) of the last entry already seen, or
+                None to start from the beginning
+            count: Maximum number of entries to return
+            low: Smallest sort key to include, or None
+            high: Largest sort key to include, or None
+
+        Returns:
+            list: (sort key, sequence) pairs in display order
+        """
+        entries = self.columns[column]
+        first = 0 if low is None else entries.bisect_left((low,))
+        last = len(entries) if high is None else entries.bisect_left((high, len(entries)))
+        if direction == "desc":
+            end = last if after is None else min(entries.bisect_left(tuple(after)), last)
+            return entries.slice(max(end - count, first), end)[::-1]
+        start = first if after is None else max(entries.bisect_right(tuple(after)), first)
+        return entries.slice(start, min(start + count, last))
+
+    def between(self, since=None, until=None, direction="desc", count=10):
+        """
+        Get the scores dated within a range, in date order.
+
+        Args:
+            since: Earliest date as epoch seconds, or None
+            until: Latest date as epoch seconds, or None
+            direction: Sort direction (asc, desc)
+            count: Maximum number of scores to return
+
+        Returns:
+            list: Score objects in display order
+        """
+        entries = self.seek("date", direction, None, count, since, until)
+        return [self.scores[seq] for _, seq in entries]
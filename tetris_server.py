@@ -0,0 +1,753 @@
+"""
+Module containing a local stand-in for the Tetris scores API.
+Serves the same /api/scores and /api/test contract as the deployed server,
+using only the standard library, so the Python clients can be run and
+measured without Node or a database.
+"""
+
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from tetris_ranking import WINDOWS
+from tetris_scores import SORT_COLUMNS, date_to_epoch, sort_key
+from tetris_storage import (
+    DEFAULT_DATABASE, DEFAULT_SCORE_LOG, DEFAULT_SCORES_FILE, LEADERBOARD_LIMIT, JSONScoreStore, LogScoreStore,
+    SQLiteScoreStore, clean_score,
+)
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET,OPTIONS,POST",
+    "Access-Control-Allow-Headers": "Content-Type, If-None-Match",
+    "Access-Control-Expose-Headers": "ETag",
+}
+
+# Prebuilt leaderboard responses kept, one per query shape
+RESPONSE_CACHE_SIZE = 1024
+
+# Score submissions allowed per client: sustained per second, and burst
+SUBMIT_RATE = 1.0
+SUBMIT_BURST = 10
+
+# Most scores one submission may carry; the rate limit and ingest queue
+# count submissions, so this bounds the scores each of them admits
+SUBMIT_MAX_SCORES = 100
+
+# Clients whose rate limit state is remembered, least recently seen dropped first
+RATE_LIMIT_CLIENTS = 10000
+
+# Submissions waiting to be written before new ones are shed, and the
+# most written in one store insert
+INGEST_QUEUE_SIZE = 1000
+INGEST_BATCH_SIZE = 100
+
+# Seconds a shed client is told to wait before retrying
+INGEST_RETRY_AFTER = 1
+
+
+def encode_cursor(position):
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        key, seq = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return key, int(seq)
+
+
+def top_k_affected(scores, limit):
+    """
+    Tell which inserts change a top-K-by-score response.
+
+    A new score only enters the list if it is at least the lowest score
+    shown (the newest of equal scores is listed first), or if the list
+    is not full yet.
+
+    Args:
+        scores: Scores in the response, highest first
+        limit: Size of a full list
+    """
+    if len(scores) < limit:
+        return lambda score, seq: True
+    threshold = int(scores[-1].get("score") or 0)
+    return lambda score, seq: score["score"] >= threshold
+
+
+def page_affected(column, direction, after, position, low=None, high=None):
+    """
+    Tell which inserts change a keyset page.
+
+    The page shows the index entries between the cursor it was requested
+    with and its last entry (its next cursor), so a new score changes it
+    exactly when the score's (key, seq) entry falls in that range. Later
+    pages' cursors stay valid either way.
+
+    Args:
+        column: Sort column
+        direction: Sort direction (asc, desc)
+        after: Keyset position the page starts after, or None
+        position: Keyset position of the page's last entry, or None on the last page
+        low: Smallest sort key included, or None
+        high: Largest sort key included, or None
+    """
+    after = tuple(after) if after is not None else None
+    position = tuple(position) if position is not None else None
+
+    def affected(score, seq):
+        key = sort_key(score, column)
+        if (low is not None and key < low) or (high is not None and key > high):
+            return False
+        entry = (key, seq)
+        if direction == "desc":
+            return (after is None or entry < after) and (position is None or entry > position)
+        return (after is None or entry > after) and (position is None or entry < position)
+
+    return affected
+
+
+class TokenBucket:
+    """
+    Allows a sustained rate of events with bursts up to a capacity.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Most tokens the bucket holds
+            now: Current monotonic time
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def take(self, now):
+        """
+        Take one token.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-client token buckets, remembering a bounded number of clients.
+
+    A client dropped from the table comes back with a full bucket, which
+    only ever errs towards admitting.
+    """
+
+    def __init__(self, rate=SUBMIT_RATE, burst=SUBMIT_BURST, clients=RATE_LIMIT_CLIENTS, clock=time.monotonic):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Requests per second allowed per client
+            burst: Requests a client may make at once
+            clients: Most clients tracked
+            clock: Function returning the current monotonic time
+        """
+        self.rate = rate
+        self.burst = burst
+        self.clients = clients
+        self.clock = clock
+        self.buckets = OrderedDict()
+
+    def check(self, client):
+        """
+        Count a request from a client.
+
+        Args:
+            client: Client address
+
+        Returns:
+            float: 0 if the request is allowed, otherwise seconds to wait
+        """
+        now = self.clock()
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self.buckets) > self.clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        return bucket.take(now)
+
+
+class CachedResponse:
+    """
+    A response body serialized once, stored plain and gzipped with ETags.
+    """
+
+    __slots__ = ("body", "gzip_body", "etag", "gzip_etag", "affected", "day")
+
+    def __init__(self, data, affected, day=None):
+        """
+        Serialize a response.
+
+        Args:
+            data: JSON data of the response
+            affected: Function telling whether an inserted (score, seq) changes it
+            day: Day the response is valid for, for time-windowed responses
+        """
+        self.body = json.dumps(data).encode()
+        self.gzip_body = gzip.compress(self.body, 6)
+        digest = hashlib.sha1(self.body).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+        self.affected = affected
+        self.day = day
+
+    def is_current(self, store):
+        """Return False once a windowed response's day has passed."""
+        return self.day is None or self.day == store.windows.today()
+
+
+class ResponseCache:
+    """
+    Prebuilt responses by query shape, least recently used dropped first.
+
+    Inserts only drop the responses they change, so the leaderboard and
+    pages nobody's score reached keep being served without serializing.
+    """
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            size: Maximum number of responses kept
+        """
+        self.size = size
+        self.responses = OrderedDict()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def get(self, key):
+        """Return the response for a query shape, or None."""
+        response = self.responses.get(key)
+        if response is not None:
+            self.responses.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        """Store the response for a query shape."""
+        self.responses[key] = response
+        self.responses.move_to_end(key)
+        if len(self.responses) > self.size:
+            self.responses.popitem(last=False)
+        return response
+
+    def invalidate(self, added):
+        """
+        Drop the responses that new scores change.
+
+        Args:
+            added: (seq, score) pairs of the inserted scores
+        """
+        stale = [
+            key for key, response in self.responses.items()
+            if any(response.affected(score, seq) for seq, score in added)
+        ]
+        for key in stale:
+            del self.responses[key]
+
+    def clear(self):
+        """Drop every response."""
+        self.responses.clear()
+
+
+class ScoreServer:
+    """
+    Minimal asyncio HTTP/1.1 server for the scores API.
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=3001, limiter=None,
+                 queue_size=INGEST_QUEUE_SIZE, trust_proxy=False):
+        """
+        Initialize the server.
+
+        Args:
+            store: ScoreStore holding the scores (see tetris_storage)
+            host: Interface to listen on
+            port: Port to listen on
+            limiter: RateLimiter for score submissions (default: SUBMIT_RATE per client)
+            queue_size: Submissions that may wait to be written before new ones are shed
+            trust_proxy: Identify clients by X-Forwarded-For, for use behind a proxy
+        """
+        self.store = store
+        self.host = host
+        self.port = port
+        self.server = None
+        self.responses = ResponseCache()
+        self.cache_version = store.version
+
+        # Submissions are rate limited per client and written by one task
+        # from a bounded queue, so a write storm cannot starve reads
+        self.limiter = limiter or RateLimiter()
+        self.trust_proxy = trust_proxy
+        self.ingest = asyncio.Queue(queue_size)
+        self.ingest_task = None
+        self.counters = {"admitted": 0, "rate_limited": 0, "shed": 0, "written": 0}
+
+    async def start(self):
+        """Start listening for connections."""
+        self.ingest_task = asyncio.ensure_future(self.write_submissions())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """Stop the server."""
+        self.server.close()
+        await self.server.wait_closed()
+        if self.ingest_task is not None:
+            self.ingest_task.cancel()
+            self.ingest_task = None
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+
+                peer = writer.get_extra_info("peername")
+                client = peer[0] if peer else None
+                try:
+                    status, response_headers, response_body = await self.handle_request(
+                        method, target, headers, body, client
+                    )
+                except Exception as e:
+                    # A failing handler still answers, and the connection stays usable
+                    status, response_headers, response_body = self.json_response(
+                        500, {"error": "Internal server error", "message": str(e)}
+                    )
+                writer.write(self.encode_response(status, response_headers, response_body))
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def encode_response(status, headers, body):
+        """Serialize a response to bytes."""
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        for name, value in {**CORS_HEADERS, **headers}.items():
+            lines.append(f"{name}: {value}")
+        lines.append(f"Content-Length: {len(body)}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    @staticmethod
+    def json_response(status, data, headers=None):
+        """Build a JSON response tuple."""
+        return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(data).encode()
+
+    async def handle_request(self, method, target, headers, body, client=None):
+        """
+        Route a request.
+
+        Args:
+            method: HTTP method
+            target: Request target (path and query)
+            headers: Request headers, lower-case names
+            body: Request body bytes
+            client: Address of the connected client
+
+        Returns:
+            tuple: (status, headers, body bytes)
+        """
+        path = urlsplit(target).path
+        if method == "OPTIONS":
+            return 200, {}, b""
+        if path == "/api/test":
+            return self.json_response(200, {
+                "message": "API is working!",
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "method": method,
+                "url": target,
+            })
+        if path == "/api/rank" and method == "GET":
+            return self.get_rank(parse_qs(urlsplit(target).query))
+        if path == "/api/stats" and method == "GET":
+            return self.json_response(200, {**self.counters, "queued": self.ingest.qsize()})
+        if path == "/api/players" and method == "GET":
+            return self.get_player(parse_qs(urlsplit(target).query))
+        if path == "/api/scores":
+            if method == "GET":
+                query = parse_qs(urlsplit(target).query)
+                if "window" in query or "view" in query:
+                    return self.get_top_scores(query, headers)
+                if query:
+                    return self.get_score_page(query, headers)
+                return self.get_scores(headers)
+            if method == "POST":
+                return await self.post_scores(body, self.client_id(headers, client))
+            return self.json_response(405, {"error": "Method not allowed"})
+        return self.json_response(404, {"error": "Not found"})
+
+    def cached(self, key, build):
+        """
+        Get a prebuilt response for a query shape, building it on a miss.
+
+        Args:
+            key: Hashable description of the query
+            build: Function returning (data, affected) for a miss, where
+                affected(score, seq) tells whether inserting a score
+                changes the response; the data is serialized once
+
+        Returns:
+            CachedResponse: The response
+        """
+        if self.cache_version != self.store.version:
+            # The store changed without passing through post_scores
+            self.responses.clear()
+            self.cache_version = self.store.version
+        response = self.responses.get(key)
+        if response is None or not response.is_current(self.store):
+            data, affected = build()
+            response = self.responses.put(key, CachedResponse(data, affected, self.day_of(key)))
+        return response
+
+    def day_of(self, key):
+        """Return the day a windowed response is valid for, or None."""
+        return self.store.windows.today() if key[0] == "window" and key[1] != "all" else None
+
+    @staticmethod
+    def send_cached(response, headers):
+        """Answer with a cached response: 304, gzip or identity, without serializing."""
+        etag = headers.get("if-none-match")
+        if etag in (response.etag, response.gzip_etag):
+            return 304, {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}, b""
+        response_headers = {"Content-Type": "application/json", "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if "gzip" in headers.get("accept-encoding", ""):
+            return 200, {**response_headers, "ETag": response.gzip_etag, "Content-Encoding": "gzip"}, response.gzip_body
+        return 200, {**response_headers, "ETag": response.etag}, response.body
+
+    def top_response(self):
+        """Get the cached response of the whole leaderboard."""
+        def build():
+            scores = self.store.top()
+            return {"highScores": scores}, top_k_affected(scores, LEADERBOARD_LIMIT)
+
+        return self.cached(("top",), build)
+
+    def get_scores(self, headers):
+        """Handle GET /api/scores, answering 304 when the client's copy is current."""
+        return self.send_cached(self.top_response(), headers)
+
+    def get_score_page(self, query, headers):
+        """
+        Handle GET /api/scores?limit=&sort=&direction=&cursor= with keyset pagination.
+
+        The response adds "nextCursor" (null on the last page) to the usual
+        {"highScores": [...]} body. "since" and "until" (dates or epoch
+        seconds, inclusive) restrict the page to a date range; they default
+        the sort to date.
+        """
+        try:
+            limit = min(max(int(query.get("limit", [LEADERBOARD_LIMIT])[0]), 1), LEADERBOARD_LIMIT)
+            since = self.date_param(query, "since")
+            until = self.date_param(query, "until")
+            ranged = since is not None or until is not None
+            sort = query.get("sort", ["date" if ranged else "score"])[0]
+            direction = query.get("direction", ["desc"])[0]
+            cursor = query.get("cursor", [None])[0]
+            after = decode_cursor(cursor) if cursor else None
+            if sort not in SORT_COLUMNS or direction not in ("asc", "desc"):
+                raise ValueError(f"Invalid sort: {sort} {direction}")
+
+            def build():
+                scores, position = self.store.page(sort, direction, after, limit, since, until)
+                data = {"highScores": scores, "nextCursor": encode_cursor(position) if position else None}
+                return data, page_affected(sort, direction, after, position, since, until)
+
+            response = self.cached(("page", sort, direction, after, limit, since, until), build)
+        except (TypeError, ValueError) as e:
+            return self.json_response(400, {"error": "Invalid query", "message": str(e)})
+        return self.send_cached(response, headers)
+
+    def get_top_scores(self, query, headers):
+        """
+        Handle GET /api/scores?window=day|week|all&limit= with the window's top
+        scores, or ?view=players&limit= with each player's best score.
+
+        Both are answered from indexes kept up to date on insert, so the
+        cost does not grow with the number of stored scores.
+        """
+        window = query.get("window", ["all"])[0]
+        view = query.get("view", ["scores"])[0]
+        try:
+            limit = min(max(int(query.get("limit", [LEADERBOARD_LIMIT])[0]), 1), LEADERBOARD_LIMIT)
+            if window != "all" and window not in WINDOWS:
+                raise ValueError(f"Invalid window: {window}")
+            if view not in ("scores", "players") or (view == "players" and window != "all"):
+                raise ValueError(f"Invalid view: {view}")
+        except ValueError as e:
+            return self.json_response(400, {"error": "Invalid query", "message": str(e)})
+
+        def build():
+            if view == "players":
+                scores = self.store.best_per_player(limit)
+            else:
+                scores = self.store.top(limit, window)
+            # Sent whole, without a cursor, so clients can sort the rows locally
+            return {"highScores": scores}, top_k_affected(scores, limit)
+
+        return self.send_cached(self.cached(("window", window, view, limit), build), headers)
+
+    @staticmethod
+    def date_param(query, name):
+        """
+        Read a date query parameter as epoch seconds.
+
+        Raises:
+            ValueError: If the date cannot be parsed
+        """
+        value = query.get(name, [None])[0]
+        if value is None:
+            return None
+        epoch = date_to_epoch(value)
+        if not epoch:
+            raise ValueError(f"Invalid date for {name}: {value}")
+        return epoch
+
+    def get_player(self, query):
+        """Handle GET /api/players?name=&history= with a player's best and recent games."""
+        try:
+            name = query["name"][0]
+            history = int(query["history"][0]) if "history" in query else None
+        except (KeyError, ValueError):
+            return self.json_response(400, {"error": "Invalid query", "message": "Expected ?name=<player>"})
+        return self.json_response(200, self.store.player(name, history))
+
+    def get_rank(self, query):
+        """Handle GET /api/rank?score=N with the place that score has."""
+        try:
+            score = int(query["score"][0])
+        except (KeyError, ValueError):
+            return self.json_response(400, {"error": "Invalid query", "message": "Expected ?score=<integer>"})
+        return self.json_response(200, {
+            "score": score,
+            "rank": self.store.rank(score),
+            "total": len(self.store.ranks),
+        })
+
+    def client_id(self, headers, client):
+        """Identify the client a request is rate limited as."""
+        if self.trust_proxy and headers.get("x-forwarded-for"):
+            return headers["x-forwarded-for"].split(",")[0].strip()
+        return client
+
+    async def post_scores(self, body, client=None):
+        """
+        Handle POST /api/scores with an array or {"highScores": [...]} body.
+
+        Clients over their rate limit get 429 and a full ingest queue gets
+        503, both with Retry-After; more than SUBMIT_MAX_SCORES scores get
+        413. Admitted scores are queued and the response is sent once they
+        are written; it is the cached leaderboard body, so a write does not
+        serialize the top scores again unless they changed.
+        """
+        wait = self.limiter.check(client)
+        if wait:
+            self.counters["rate_limited"] += 1
+            return self.json_response(429, {"error": "Too many requests", "message": "Score rate limit exceeded"},
+                                      {"Retry-After": str(math.ceil(wait))})
+
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            data = None
+
+        if isinstance(data, list):
+            scores = data
+        elif isinstance(data, dict) and isinstance(data.get("highScores"), list):
+            scores = data["highScores"]
+        else:
+            return self.json_response(400, {
+                "error": "Invalid request format",
+                "message": "Expected array of scores or { highScores: [...] }",
+            })
+        if len(scores) > SUBMIT_MAX_SCORES:
+            return self.json_response(413, {
+                "error": "Too many scores",
+                "message": f"At most {SUBMIT_MAX_SCORES} scores per request",
+            })
+
+        try:
+            scores = [clean_score(score) for score in scores]
+        except ValueError as e:
+            return self.json_response(400, {"error": "Invalid score", "message": str(e)})
+
+        if self.ingest_task is None:
+            self.ingest_task = asyncio.ensure_future(self.write_submissions())
+        written = asyncio.get_running_loop().create_future()
+        try:
+            self.ingest.put_nowait((scores, written))
+        except asyncio.QueueFull:
+            self.counters["shed"] += 1
+            return self.json_response(503, {"error": "Service unavailable", "message": "Too many pending scores"},
+                                      {"Retry-After": str(INGEST_RETRY_AFTER)})
+        self.counters["admitted"] += 1
+
+        try:
+            await written
+        except Exception as e:
+            return self.json_response(500, {"error": "Failed to save scores", "message": str(e)})
+        return 200, {"Content-Type": "application/json"}, self.top_response().body
+
+    async def write_submissions(self):
+        """
+        Write queued submissions, combining everything waiting into one insert.
+
+        If the combined insert fails, nothing was stored, and the
+        submissions are written one at a time so that only the ones that
+        fail on their own get the error.
+        """
+        while True:
+            batch = [await self.ingest.get()]
+            while len(batch) < INGEST_BATCH_SIZE and not self.ingest.empty():
+                batch.append(self.ingest.get_nowait())
+
+            first = len(self.store.scores)
+            try:
+                self.store.add_scores([score for scores, _ in batch for score in scores])
+                errors = [None] * len(batch)
+            except Exception:
+                errors = []
+                for scores, _ in batch:
+                    try:
+                        self.store.add_scores(scores)
+                        errors.append(None)
+                    except Exception as e:
+                        errors.append(e)
+            self.invalidate(first)
+
+            for (_, written), error in zip(batch, errors):
+                if error is None:
+                    self.counters["written"] += 1
+                if written.done():
+                    continue
+                if error is None:
+                    written.set_result(True)
+                else:
+                    written.set_exception(error)
+
+            # Let waiting reads run between batches
+            await asyncio.sleep(0)
+
+    def invalidate(self, first):
+        """
+        Drop the cached responses that the scores stored from position first on change.
+
+        Args:
+            first: Position of the first newly added score
+        """
+        added = list(enumerate(self.store.scores[first:], first))
+        if added:
+            self.responses.invalidate(added)
+        self.cache_version = self.store.version
+
+
+async def serve(host, port, store, **options):
+    """Run the server until cancelled; options are passed to ScoreServer."""
+    server = await ScoreServer(store, host, port, **options).start()
+    print(f"Tetris score server listening on http://{server.host}:{server.port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main(argv=None):
+    """Parse the command line and run the server."""
+    parser = argparse.ArgumentParser(description="Local Tetris scores API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--db", default=DEFAULT_DATABASE, help="SQLite database to store scores in")
+    parser.add_argument("--scores-file", default=DEFAULT_SCORES_FILE,
+                        help="scores.json to import into a new database, or to use with --json")
+    parser.add_argument("--json", action="store_true", help="Store scores in --scores-file instead of SQLite")
+    parser.add_argument("--log", action="store_true",
+                        help="Append scores to --log-file and compact them into --scores-file instead of SQLite")
+    parser.add_argument("--log-file", default=DEFAULT_SCORE_LOG, help="Score log to use with --log")
+    parser.add_argument("--submit-rate", type=float, default=SUBMIT_RATE,
+                        help="Score submissions allowed per client per second")
+    parser.add_argument("--submit-burst", type=int, default=SUBMIT_BURST,
+                        help="Score submissions a client may make at once")
+    parser.add_argument("--queue-size", type=int, default=INGEST_QUEUE_SIZE,
+                        help="Submissions waiting to be written before new ones get 503")
+    parser.add_argument("--trust-proxy", action="store_true", help="Rate limit clients by X-Forwarded-For")
+    args = parser.parse_args(argv)
+
+    if args.json:
+        store = JSONScoreStore(args.scores_file)
+    elif args.log:
+        store = LogScoreStore(args.log_file, args.scores_file)
+    else:
+        store = SQLiteScoreStore(args.db, args.scores_file)
+    try:
+        asyncio.run(serve(
+            args.host, args.port, store,
+            limiter=RateLimiter(args.submit_rate, args.submit_burst),
+            queue_size=args.queue_size,
+            trust_proxy=args.trust_proxy,
+        ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Module containing the spectator stream for battle matches.
+Encodes board state as compact binary frames that carry only what
+changed since the previous frame, and fans each frame out to every
+viewer of a match without re-encoding it.
+
+Frame layout (little-endian):
+    header:  kind (B: KEYFRAME or DELTA), frame number (I), player count (B)
+    player:  flags (B), then only the parts the flags name:
+             ROWS   changed-row mask (I), then 5 bytes per changed row
+                    (two cells per byte, low nibble first)
+             PIECE  type, rotation (B B), x, y (b b)
+             NEXT   next piece type (B)
+             STATS  score (I), lines (H), level, pending garbage (B B)
+A keyframe is a frame with every part of every player present.
+"""
+
+import asyncio
+import struct
+from collections import deque
+
+from tetris_constants import COLS, ROWS
+
+KEYFRAME = 1
+DELTA = 2
+
+# Player part flags
+ROWS_CHANGED = 1
+PIECE_CHANGED = 2
+NEXT_CHANGED = 4
+STATS_CHANGED = 8
+ALL_CHANGED = ROWS_CHANGED | PIECE_CHANGED | NEXT_CHANGED | STATS_CHANGED
+
+# Frames between forced keyframes, so a viewer that lost a frame recovers
+KEYFRAME_INTERVAL = 300
+
+# Frames a viewer may fall behind before it is skipped ahead to a keyframe
+VIEWER_QUEUE_SIZE = 120
+
+HEADER = struct.Struct("<BIB")
+MASK = struct.Struct("<I")
+PIECE = struct.Struct("<BBbb")
+STATS = struct.Struct("<IHBB")
+ALL_ROWS = (1 << ROWS) - 1
+NO_PIECE = (0, 0, 0, 0)
+
+
+def pack_row(cells, start):
+    """Pack one board row into COLS // 2 bytes, two cells per byte."""
+    return bytes(cells[i] | (cells[i + 1] << 4) for i in range(start, start + COLS, 2))
+
+
+def unpack_row(data, offset):
+    """Unpack a row packed by pack_row."""
+    row = bytearray(COLS)
+    for i in range(COLS // 2):
+        value = data[offset + i]
+        row[2 * i] = value & 15
+        row[2 * i + 1] = value >> 4
+    return row
+
+
+def player_view(engine):
+    """
+    Take the parts of an engine's state that spectators see.
+
+    Returns:
+        tuple: (board bytes, piece tuple, next piece type, stats tuple)
+    """
+    piece = engine.current_piece
+    return (
+        bytes(engine.board.cells),
+        (piece.type, piece.rotation, engine.current_x, engine.current_y) if piece else NO_PIECE,
+        engine.next_piece.type if engine.next_piece else 0,
+        (engine.score, engine.lines_cleared, engine.level, min(engine.pending_garbage, 255)),
+    )
+
+
+class FrameEncoder:
+    """
+    Encodes a match's players as delta frames against the last frame.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Initialize the encoder.
+
+        Args:
+            keyframe_interval: Frames between forced keyframes
+        """
+        self.keyframe_interval = keyframe_interval
+        self.previous = None
+        self.frames = 0
+
+    def encode(self, frame, engines, keyframe=False):
+        """
+        Encode the engines' state.
+
+        Args:
+            frame: Frame number
+            engines: TetrisEngine of each player
+            keyframe: Send everything, not only what changed
+
+        Returns:
+            bytes: The frame, or None if nothing changed
+        """
+        views = [player_view(engine) for engine in engines]
+        previous = self.previous
+        if previous is None or len(previous) != len(views) or self.frames % self.keyframe_interval == 0:
+            keyframe = True
+        self.previous = views
+        self.frames += 1
+
+        parts = [HEADER.pack(KEYFRAME if keyframe else DELTA, frame, len(views))]
+        changed = keyframe
+        for number, (board, piece, next_type, stats) in enumerate(views):
+            if keyframe:
+                flags, mask = ALL_CHANGED, ALL_ROWS
+            else:
+                old_board, old_piece, old_next, old_stats = previous[number]
+                mask = 0
+                if board != old_board:
+                    for y in range(ROWS):
+                        start = y * COLS
+                        if board[start:start + COLS] != old_board[start:start + COLS]:
+                            mask |= 1 << y
+                flags = ((ROWS_CHANGED if mask else 0) | (PIECE_CHANGED if piece != old_piece else 0)
+                         | (NEXT_CHANGED if next_type != old_next else 0)
+                         | (STATS_CHANGED if stats != old_stats else 0))
+                changed = changed or bool(flags)
+
+            parts.append(bytes((flags,)))
+            if flags & ROWS_CHANGED:
+                parts.append(MASK.pack(mask))
+                parts.extend(pack_row(board, y * COLS) for y in range(ROWS) if mask >> y & 1)
+            if flags & PIECE_CHANGED:
+                parts.append(PIECE.pack(*piece))
+            if flags & NEXT_CHANGED:
+                parts.append(bytes((next_type,)))
+            if flags & STATS_CHANGED:
+                parts.append(STATS.pack(*stats))
+        return b"".join(parts) if changed else None
+
+
+class FrameDecoder:
+    """
+    Rebuilds what a spectator sees from a stream of frames.
+    """
+
+    def __init__(self):
+        self.frame = None
+        self.players = []
+
+    def apply(self, data):
+        """
+        Apply one frame.
+
+        Args:
+            data: Frame bytes
+
+        Returns:
+            bool: False if a delta arrived before any keyframe and was ignored
+        """
+        kind, frame, count = HEADER.unpack_from(data, 0)
+        if kind == DELTA and len(self.players) != count:
+            return False
+        if kind == KEYFRAME:
+            self.players = [
+                {"board": bytearray(ROWS * COLS), "piece": NO_PIECE, "next": 0, "stats": (0, 0, 1, 0)}
+                for _ in range(count)
+            ]
+        self.frame = frame
+
+        offset = HEADER.size
+        for player in self.players:
+            flags = data[offset]
+            offset += 1
+            if flags & ROWS_CHANGED:
+                (mask,) = MASK.unpack_from(data, offset)
+                offset += MASK.size
+                for y in range(ROWS):
+                    if mask >> y & 1:
+                        player["board"][y * COLS:(y + 1) * COLS] = unpack_row(data, offset)
+                        offset += COLS // 2
+            if flags & PIECE_CHANGED:
+                player["piece"] = PIECE.unpack_from(data, offset)
+                offset += PIECE.size
+            if flags & NEXT_CHANGED:
+                player["next"] = data[offset]
+                offset += 1
+            if flags & STATS_CHANGED:
+                player["stats"] = STATS.unpack_from(data, offset)
+                offset += STATS.size
+        return True
+
+
+class Viewer:
+    """
+    One spectator's subscription: a bounded frame queue.
+
+    Once the subscription is closed, frames already queued are still
+    returned, then next_frame() returns None.
+    """
+
+    __slots__ = ("channel", "frames", "ready", "closed")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.frames = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def close(self):
+        """End the stream, waking a pending next_frame()."""
+        self.closed = True
+        self.ready.set()
+
+    async def next_frame(self):
+        """
+        Wait for and return the next frame.
+
+        Returns:
+            bytes: The frame, or None once the stream has ended
+        """
+        while not self.frames:
+            if self.closed:
+                return None
+            self.ready.clear()
+            await self.ready.wait()
+        return self.frames.popleft()
+
+
+class SpectatorHub:
+    """
+    In-process pub/sub for spectator frames, standing in for a broker.
+
+    Each channel has one encoder; a published frame is encoded once and
+    the same bytes object is queued for every viewer. New viewers start
+    from a keyframe, and a viewer that falls VIEWER_QUEUE_SIZE frames
+    behind has its backlog replaced by a keyframe.
+    """
+
+    def __init__(self, queue_size=VIEWER_QUEUE_SIZE, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Initialize the hub.
+
+        Args:
+            queue_size: Frames a viewer may have waiting
+            keyframe_interval: Frames between forced keyframes
+        """
+        self.queue_size = queue_size
+        self.keyframe_interval = keyframe_interval
+        self.viewers = {}  # channel -> set of Viewer
+        self.encoders = {}
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    def has_viewers(self, channel):
+        """Return True if anyone watches a channel."""
+        return bool(self.viewers.get(channel))
+
+    def subscribe(self, channel, frame, engines):
+        """
+        Start watching a channel.
+
+        Args:
+            channel: Channel name, e.g. the match id
+            frame: Current frame number
+            engines: Current TetrisEngine of each player, for the first keyframe
+
+        Returns:
+            Viewer: The subscription
+        """
+        viewer = Viewer(channel)
+        self.viewers.setdefault(channel, set()).add(viewer)
+        encoder = self.encoders.setdefault(channel, FrameEncoder(self.keyframe_interval))
+        # Re-basing the encoder is safe: existing viewers already hold this state
+        self.deliver(viewer, encoder.encode(frame, engines, keyframe=True))
+        return viewer
+
+    def unsubscribe(self, viewer):
+        """Stop watching."""
+        viewer.close()
+        viewers = self.viewers.get(viewer.channel)
+        if viewers is not None:
+            viewers.discard(viewer)
+            if not viewers:
+                del self.viewers[viewer.channel]
+                self.encoders.pop(viewer.channel, None)
+
+    def close(self, channel):
+        """Drop a channel and end its viewers' streams, e.g. when the match ends."""
+        for viewer in self.viewers.pop(channel, ()):
+            viewer.close()
+        self.encoders.pop(channel, None)
+
+    def publish(self, channel, frame, engines):
+        """
+        Send the engines' current state to a channel's viewers.
+
+        Args:
+            channel: Channel name
+            frame: Frame number
+            engines: TetrisEngine of each player
+
+        Returns:
+            int: Number of viewers the frame was queued for
+        """
+        viewers = self.viewers.get(channel)
+        if not viewers:
+            return 0
+        encoder = self.encoders[channel]
+        data = encoder.encode(frame, engines)
+        if data is None:
+            return 0
+
+        keyframe = None
+        for viewer in viewers:
+            if len(viewer.frames) >= self.queue_size:
+                # Skip a lagging viewer ahead: everything queued is replaced
+                if keyframe is None:
+                    keyframe = FrameEncoder().encode(frame, engines, keyframe=True)
+                viewer.frames.clear()
+                self.deliver(viewer, keyframe)
+            else:
+                self.deliver(viewer, data)
+        return len(viewers)
+
+    def deliver(self, viewer, data):
+        """Queue a frame for a viewer."""
+        viewer.frames.append(data)
+        viewer.ready.set()
+        self.frames_sent += 1
+        self.bytes_sent += len(data)
@@ -0,0 +1,206 @@
+"""
+Module containing compact, immutable game-state snapshots.
+Used by search, undo and rollback, which copy the game state far more
+often than they change it.
+"""
+
+import random
+import struct
+
+from tetris_constants import COLS, ROWS
+
+MASK64 = (1 << 64) - 1
+
+# Everything except the board, in serialized order
+FIELDS = struct.Struct("<BBbbBIIHH?QQ")
+
+# Size of GameState.to_bytes(): the fields, then ROWS rows of COLS bytes
+STATE_SIZE = FIELDS.size + ROWS * COLS
+
+EMPTY_ROWS = (0,) * ROWS
+
+
+class GameRandom:
+    """
+    Small seeded generator (SplitMix64) for piece and garbage draws.
+
+    Its whole state is one 64-bit int, so it can be saved with every
+    snapshot, where random.Random's state is 625 words. Provides the
+    subset of the random.Random interface the engine uses.
+    """
+
+    __slots__ = ("state",)
+
+    def __init__(self, seed=None):
+        """
+        Initialize the generator.
+
+        Args:
+            seed: Any value random.Random accepts as a seed (default: random)
+        """
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Reset the generator from a seed."""
+        self.state = random.Random(seed).getrandbits(64)
+
+    def getstate(self):
+        """Return the generator state as an int."""
+        return self.state
+
+    def setstate(self, state):
+        """Restore a state returned by getstate()."""
+        self.state = state
+
+    def next(self):
+        """Return the next 64-bit value."""
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def randrange(self, stop):
+        """Return a value in range(stop)."""
+        return self.next() % stop
+
+    def randint(self, a, b):
+        """Return a value between a and b inclusive."""
+        return a + self.next() % (b - a + 1)
+
+
+class GameState:
+    """
+    Immutable snapshot of an engine (see TetrisEngine.snapshot).
+
+    The board is a tuple of ROWS ints, one per row, each the row's COLS
+    cell bytes read as a little-endian int. Snapshots taken one after
+    another share the int objects of rows that did not change, so a
+    search tree of states only pays for the rows each move touched.
+    Because states never change, cloning one is free.
+    """
+
+    __slots__ = (
+        "rows", "piece", "next_type", "score", "lines", "level",
+        "pending_garbage", "game_over", "rng_state", "garbage_rng_state",
+    )
+
+    def __init__(self, rows=EMPTY_ROWS, piece=None, next_type=0, score=0, lines=0, level=1,
+                 pending_garbage=0, game_over=False, rng_state=0, garbage_rng_state=0):
+        """
+        Initialize the snapshot.
+
+        Args:
+            rows: Tuple of ROWS packed rows
+            piece: (type, rotation, x, y) of the current piece, or None
+            next_type: Type of the next piece (0 for none)
+            score: Score
+            lines: Lines cleared
+            level: Level
+            pending_garbage: Garbage lines waiting to rise
+            game_over: Whether the game has ended
+            rng_state: Piece generator state
+            garbage_rng_state: Garbage generator state
+        """
+        self.rows = rows
+        self.piece = piece
+        self.next_type = next_type
+        self.score = score
+        self.lines = lines
+        self.level = level
+        self.pending_garbage = pending_garbage
+        self.game_over = game_over
+        self.rng_state = rng_state
+        self.garbage_rng_state = garbage_rng_state
+
+    def __eq__(self, other):
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((self.rows, self.piece, self.score, self.rng_state))
+
+    def __repr__(self):
+        return f"GameState(piece={self.piece}, score={self.score}, lines={self.lines}, level={self.level})"
+
+    def clone(self):
+        """Return a copy; states are immutable, so this is the state itself."""
+        return self
+
+    def replace(self, **changes):
+        """
+        Return a copy with some fields changed, sharing everything else.
+
+        Args:
+            **changes: Field values to change
+
+        Returns:
+            GameState: The new state
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return GameState(**values)
+
+    def with_rows(self, rows):
+        """
+        Return a copy with some board rows replaced.
+
+        Args:
+            rows: {row index: COLS cell values} for the rows to change
+
+        Returns:
+            GameState: The new state; unchanged rows are shared
+        """
+        board = list(self.rows)
+        for y, cells in rows.items():
+            board[y] = int.from_bytes(bytes(cells), "little")
+        return self.replace(rows=tuple(board))
+
+    def cell(self, x, y):
+        """Return the piece type at (x, y), or 0 if the cell is empty."""
+        return self.rows[y] >> (8 * x) & 255
+
+    def board_bytes(self):
+        """Return the board as ROWS * COLS row-major cell bytes."""
+        return b"".join(row.to_bytes(COLS, "little") for row in self.rows)
+
+    def to_bytes(self):
+        """
+        Serialize to exactly STATE_SIZE bytes.
+
+        Returns:
+            bytes: The serialized state
+        """
+        piece_type, rotation, x, y = self.piece or (0, 0, 0, 0)
+        return FIELDS.pack(
+            piece_type, rotation, x, y, self.next_type, self.score, self.lines,
+            self.level, self.pending_garbage, self.game_over,
+            self.rng_state, self.garbage_rng_state,
+        ) + self.board_bytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild a state serialized by to_bytes().
+
+        Args:
+            data: STATE_SIZE bytes
+
+        Returns:
+            GameState: The state
+
+        Raises:
+            ValueError: If data is not STATE_SIZE bytes long
+        """
+        if len(data) != STATE_SIZE:
+            raise ValueError(f"Expected {STATE_SIZE} bytes, got {len(data)}")
+        (piece_type, rotation, x, y, next_type, score, lines, level,
+         pending_garbage, game_over, rng_state, garbage_rng_state) = FIELDS.unpack_from(data)
+        offset = FIELDS.size
+        rows = tuple(
+            int.from_bytes(data[start:start + COLS], "little") for start in range(offset, offset + ROWS * COLS, COLS)
+        )
+        return cls(
+            rows, (piece_type, rotation, x, y) if piece_type else None, next_type, score, lines,
+            level, pending_garbage, game_over, rng_state, garbage_rng_state,
+        )
@@ -0,0 +1,567 @@
+"""
+Module containing the score storage backends for the local score service.
+Every store keeps all scores in an in-memory ScoreIndex, so reads never
+touch disk; the backends only differ in how inserts are persisted.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from tetris_ranking import DAY_SECONDS, FUTURE_DAYS, PlayerIndex, RankIndex, WindowedLeaderboard
+from tetris_scores import ScoreIndex, date_to_epoch
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCORES_FILE = os.path.join(ROOT, "scores.json")
+DEFAULT_DATABASE = os.path.join(ROOT, "scores.db")
+DEFAULT_SCORE_LOG = os.path.join(ROOT, "scores.jsonl")
+
+# Score log writes are fsynced once this many are pending, or this many
+# seconds after the first unsynced write
+LOG_SYNC_BATCH = 100
+LOG_SYNC_INTERVAL = 1.0
+
+# Log records that trigger a background compaction into the snapshot
+LOG_COMPACT_RECORDS = 10000
+
+# Number of scores in the default leaderboard, and the largest page size
+LEADERBOARD_LIMIT = 100
+
+# Highest score, level and line count a submission may have
+MAX_SCORE = 10 ** 8
+MAX_LEVEL = 1000
+MAX_LINES = 10 ** 6
+
+# Seconds a submitted date may be ahead of the server clock
+MAX_CLOCK_SKEW = FUTURE_DAYS * DAY_SECONDS
+
+
+class ScoreStore:
+    """
+    Keeps the scores in memory only.
+    """
+
+    def __init__(self, scores=()):
+        """
+        Initialize the store.
+
+        Args:
+            scores: Initial score objects
+        """
+        self.version = 0
+        self.index = ScoreIndex(scores)
+        self.identities = {score_identity(score) for score in self.scores}
+        self.ranks = RankIndex((score.get("score") or 0 for score in self.scores), max_score=MAX_SCORE)
+        self.windows = WindowedLeaderboard(LEADERBOARD_LIMIT)
+        self.players = PlayerIndex()
+        for seq, score in enumerate(self.scores):
+            self.windows.add(date_to_epoch(score.get("date")), score.get("score") or 0, seq)
+            self.players.add(score.get("name"), score.get("score"), seq)
+
+    @property
+    def scores(self):
+        """All stored scores, in insertion order."""
+        return self.index.scores
+
+    def top(self, limit=LEADERBOARD_LIMIT, window=None):
+        """
+        Return the best scores, highest first.
+
+        Args:
+            limit: Maximum number of scores
+            window: Time window (day, week), or None for all time
+
+        Raises:
+            KeyError: If the window is unknown
+        """
+        if window is None or window == "all":
+            return self.index.page("score", "desc", 0, limit)
+        return [self.scores[seq] for seq in self.windows.top(window, limit)]
+
+    def best_per_player(self, limit=LEADERBOARD_LIMIT):
+        """Return every player's best score, best players first."""
+        return [self.scores[seq] for seq in self.players.top(0, limit)]
+
+    def player(self, name, history=None):
+        """
+        Get a player's best score and latest games.
+
+        Args:
+            name: Player name, matched case-insensitively
+            history: Maximum number of recent games (default: all kept)
+
+        Returns:
+            dict: {"name", "best", "recent"}; best is None for an unknown player
+        """
+        best = self.players.best_of(name)
+        return {
+            "name": name,
+            "best": None if best is None else self.scores[best],
+            "recent": [self.scores[seq] for seq in self.players.recent_of(name, history)],
+        }
+
+    def rank(self, score):
+        """
+        Get the place a score has on the all-time leaderboard.
+
+        Args:
+            score: Score value
+
+        Returns:
+            int: 1 for the best score; ties share a place
+        """
+        return self.ranks.rank(score)
+
+    def page(self, sort="score", direction="desc", after=None, limit=LEADERBOARD_LIMIT, since=None, until=None):
+        """
+        Get one page of the leaderboard by keyset pagination.
+
+        Args:
+            sort: Column to sort by
+            direction: Sort direction (asc, desc)
+            after: Keyset position from the previous page's cursor, or None
+            limit: Page size
+            since: Earliest date as epoch seconds (date sort only), or None
+            until: Latest date as epoch seconds (date sort only), or None
+
+        Returns:
+            tuple: (scores, keyset position of the last score or None at the end)
+
+        Raises:
+            ValueError: If a date range is given for another sort column
+        """
+        if (since is not None or until is not None) and sort != "date":
+            raise ValueError("A date range requires sort=date")
+        entries = self.index.seek(sort, direction, after, limit + 1, since, until)
+        more = len(entries) > limit
+        entries = entries[:limit]
+        scores = [self.scores[seq] for _, seq in entries]
+        return scores, (entries[-1] if more else None)
+
+    def add_scores(self, scores):
+        """
+        Add new scores, skipping duplicates.
+
+        A score is a duplicate if its submission id, or for scores without
+        one its name, score, level, lines and date, was stored before (see
+        score_identity). The check is a set lookup, so retried submissions
+        are dropped at write time without scanning the stored scores.
+
+        The new scores are persisted before they are indexed, so if
+        saving fails, nothing is added and the store is unchanged.
+
+        Args:
+            scores: List of score objects
+
+        Returns:
+            int: Number of scores added
+
+        Raises:
+            ValueError: If a score is malformed; nothing is added
+        """
+        scores = [clean_score(score) for score in scores]
+        added = []
+        identities = set()
+        for score in scores:
+            identity = score_identity(score)
+            if identity not in self.identities and identity not in identities:
+                identities.add(identity)
+                added.append(score)
+        if not added:
+            return 0
+
+        # Only scores that were saved reach the in-memory indexes
+        self.persist(added)
+        for score in added:
+            seq = len(self.scores)
+            self.windows.add(date_to_epoch(score["date"]), score["score"], seq)
+            self.players.add(score["name"], score["score"], seq)
+            self.index.add(score)
+            self.ranks.add(score["score"])
+        self.identities |= identities
+        self.version += 1
+        return len(added)
+
+    def persist(self, scores):
+        """
+        Save new scores before they are added to the store.
+
+        Args:
+            scores: The scores being added
+        """
+
+    def close(self):
+        """Release any resources held by the store."""
+
+
+class JSONScoreStore(ScoreStore):
+    """
+    Persists the scores to a scores.json file, rewriting it on each insert.
+    """
+
+    def __init__(self, path=DEFAULT_SCORES_FILE):
+        """
+        Initialize the store.
+
+        Args:
+            path: scores.json file to load from and save to
+        """
+        self.path = path
+        super().__init__(load_json_scores(path))
+
+    def persist(self, scores):
+        """Write all scores, including the new ones, back to the scores file."""
+        write_atomic(self.path, json.dumps({"highScores": self.scores + scores}, indent=2))
+
+
+class LogScoreStore(ScoreStore):
+    """
+    Appends each score to a JSON-lines log and compacts it into scores.json.
+
+    An insert writes one line per score, so its cost does not depend on
+    how many scores are stored. Writes are fsynced in batches: when
+    LOG_SYNC_BATCH are pending, or LOG_SYNC_INTERVAL seconds after the
+    first unsynced one. On startup the snapshot is loaded and the log is
+    streamed on top of it; a torn last line from a crash is cut off.
+
+    Once the log holds LOG_COMPACT_RECORDS records, a background thread
+    writes all scores to the snapshot atomically (temporary file, fsync,
+    rename) and then drops the compacted records from the log. Inserts
+    append and index under the same lock the compaction reads under, so
+    it sees each score in both or in neither. Scores
+    found in both the snapshot and the log, left by a crash during
+    compaction, are loaded once.
+    """
+
+    def __init__(self, path=DEFAULT_SCORE_LOG, snapshot_path=DEFAULT_SCORES_FILE,
+                 compact_records=LOG_COMPACT_RECORDS):
+        """
+        Initialize the store.
+
+        Args:
+            path: JSON-lines score log
+            snapshot_path: scores.json the log is compacted into
+            compact_records: Log records that trigger a compaction, or 0 for never
+        """
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.compact_records = compact_records
+        # Reentrant, so add_scores can hold it across persist and indexing
+        self.lock = threading.RLock()
+        self.compactor = None
+        self.sync_timer = None
+        self.unsynced = 0
+
+        scores = load_json_scores(snapshot_path)
+        logged = self.read_log()
+        self.log_records = len(logged)
+
+        # Drop log records the snapshot already has
+        seen = {score_identity(score) for score in scores}
+        for score in logged:
+            identity = score_identity(score)
+            if identity not in seen:
+                seen.add(identity)
+                scores.append(score)
+        super().__init__(scores)
+        self.log = open(path, "ab")
+
+    def read_log(self):
+        """
+        Stream the scores from the log, cutting off a torn last line.
+
+        Returns:
+            list: Logged score objects, oldest first
+        """
+        if not os.path.exists(self.path):
+            return []
+        scores = []
+        with open(self.path, "rb+") as f:
+            good = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Unterminated record")
+                    scores.append(json.loads(line))
+                except ValueError:
+                    # Anything after a bad record was never acknowledged
+                    f.truncate(good)
+                    break
+                good += len(line)
+        return scores
+
+    def persist(self, scores):
+        """Append the new scores to the log."""
+        with self.lock:
+            self.log.write("".join(json.dumps(score) + "\n" for score in scores).encode())
+            self.log.flush()
+            self.log_records += len(scores)
+            self.unsynced += len(scores)
+            if self.unsynced >= LOG_SYNC_BATCH:
+                self.sync_locked()
+            elif self.sync_timer is None:
+                self.sync_timer = threading.Timer(LOG_SYNC_INTERVAL, self.sync)
+                self.sync_timer.daemon = True
+                self.sync_timer.start()
+
+    def add_scores(self, scores):
+        """Add new scores, then compact the log in the background if it is due."""
+        # A compaction must never see scores in the log that are not indexed
+        # yet: it would cut them from the log without writing them to the snapshot
+        with self.lock:
+            added = super().add_scores(scores)
+        if self.compact_records and self.log_records >= self.compact_records:
+            self.compact(wait=False)
+        return added
+
+    def sync(self):
+        """Flush pending log writes to disk."""
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        """Flush pending log writes to disk; the caller holds the lock."""
+        if self.sync_timer is not None:
+            self.sync_timer.cancel()
+            self.sync_timer = None
+        if self.unsynced and not self.log.closed:
+            os.fsync(self.log.fileno())
+            self.unsynced = 0
+
+    def compact(self, wait=True):
+        """
+        Rewrite the snapshot with every score and drop them from the log.
+
+        Args:
+            wait: Block until done; otherwise compact in a background thread
+
+        Returns:
+            threading.Thread or None: The background compaction, if one was started
+        """
+        if self.compactor is not None and self.compactor.is_alive():
+            if wait:
+                self.compactor.join()
+            return None
+        if wait:
+            self.compact_now()
+            return None
+        self.compactor = threading.Thread(target=self.compact_now, daemon=True)
+        self.compactor.start()
+        return self.compactor
+
+    def compact_now(self):
+        """Compact the log into the snapshot in the calling thread."""
+        with self.lock:
+            self.sync_locked()
+            offset = self.log.tell()
+            scores = list(self.scores)
+            compacted = self.log_records
+
+        # The log still has every record until the snapshot is in place
+        write_atomic(self.snapshot_path, json.dumps({"highScores": scores}, indent=2))
+
+        with self.lock:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+            self.log.close()
+            write_atomic(self.path, tail)
+            self.log = open(self.path, "ab")
+            self.log_records -= compacted
+
+    def close(self):
+        """Finish any compaction and sync the log."""
+        if self.compactor is not None:
+            self.compactor.join()
+        with self.lock:
+            self.sync_locked()
+            self.log.close()
+
+
+class SQLiteScoreStore(ScoreStore):
+    """
+    Persists the scores to SQLite in WAL mode.
+
+    The table mirrors the deployed high_scores schema, with indexes on
+    score, date and player name. All rows are loaded into memory at
+    startup; afterwards SQLite only sees inserts, one transaction per
+    request.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE, import_path=DEFAULT_SCORES_FILE):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file
+            import_path: scores.json file to import when the database is empty
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS high_scores (
+                id INTEGER PRIMARY KEY,
+                client_id TEXT,
+                player_name TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                lines INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                original_index INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS high_scores_score ON high_scores (score DESC);
+            CREATE INDEX IF NOT EXISTS high_scores_date ON high_scores (date);
+            CREATE INDEX IF NOT EXISTS high_scores_name ON high_scores (player_name);
+        """)
+        try:
+            # Let the database reject a submission id it already has
+            self.db.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS high_scores_client_id ON high_scores (client_id) "
+                "WHERE client_id IS NOT NULL"
+            )
+        except sqlite3.IntegrityError:
+            # Older databases may hold duplicates; the in-memory check still applies
+            pass
+
+        rows = self.db.execute(
+            "SELECT client_id, player_name, score, level, lines, date, original_index FROM high_scores ORDER BY id"
+        ).fetchall()
+        super().__init__(self.row_to_score(row) for row in rows)
+
+        # Seed a new database from the JSON leaderboard
+        if not rows and import_path:
+            self.add_scores(load_json_scores(import_path))
+
+    @staticmethod
+    def row_to_score(row):
+        """Convert a database row to a score object."""
+        client_id, name, score, level, lines, date, original_index = row
+        result = {"name": name, "score": score, "level": level, "lines": lines, "date": date}
+        if original_index is not None:
+            result["originalIndex"] = original_index
+        if client_id is not None:
+            result["id"] = client_id
+        return result
+
+    def persist(self, scores):
+        """Insert the new scores in one transaction."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO high_scores (client_id, player_name, score, level, lines, date, original_index) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (score.get("id"), score["name"], score["score"], score["level"],
+                     score["lines"], score["date"], score.get("originalIndex"))
+                    for score in scores
+                ],
+            )
+
+    def close(self):
+        """Close the database connection."""
+        self.db.close()
+
+
+def clean_score(score):
+    """
+    Validate a submitted score and coerce its fields to their stored types.
+
+    Args:
+        score: Score object from a request
+
+    Returns:
+        dict: The cleaned score
+
+    Raises:
+        ValueError: If the score is not an object, a field has the wrong
+            type, a number is out of range or the date cannot be parsed or
+            is in the future
+    """
+    if not isinstance(score, dict):
+        raise ValueError(f"Score must be an object: {score!r}")
+    try:
+        cleaned = {
+            "name": str(score.get("name") or "Anonymous"),
+            "score": int(score.get("score") or 0),
+            "level": int(score.get("level") or 1),
+            "lines": int(score.get("lines") or 0),
+            "date": str(score.get("date") or ""),
+        }
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"Invalid score: {score!r}") from e
+    if not 0 <= cleaned["score"] <= MAX_SCORE:
+        raise ValueError(f"Score out of range: {cleaned['score']}")
+    if not 1 <= cleaned["level"] <= MAX_LEVEL:
+        raise ValueError(f"Level out of range: {cleaned['level']}")
+    if not 0 <= cleaned["lines"] <= MAX_LINES:
+        raise ValueError(f"Lines out of range: {cleaned['lines']}")
+    # Undated scores are allowed; a date must parse and not be in the future
+    if cleaned["date"] and not 0 < date_to_epoch(cleaned["date"]) <= time.time() + MAX_CLOCK_SKEW:
+        raise ValueError(f"Invalid date: {cleaned['date']!r}")
+    if score.get("originalIndex") is not None:
+        original_index = score["originalIndex"]
+        if type(original_index) is not int or not 0 <= original_index < 2 ** 31:
+            raise ValueError(f"Invalid originalIndex: {original_index!r}")
+        cleaned["originalIndex"] = original_index
+    if score.get("id") is not None:
+        cleaned["id"] = str(score["id"])
+    return cleaned
+
+
+def write_atomic(path, text):
+    """
+    Replace a file's contents so readers see either the old or the new file.
+
+    Args:
+        path: File to write
+        text: New contents, str or bytes
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode() if isinstance(text, str) else text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def score_identity(score):
+    """
+    Get the key two submissions of the same score share.
+
+    Args:
+        score: Score object
+
+    Returns:
+        tuple: ("id", id) for scores with a client submission id, otherwise
+            ("fields", name, score, level, lines, date)
+    """
+    if score.get("id") is not None:
+        return ("id", str(score["id"]))
+    return ("fields", str(score.get("name") or "Anonymous"), int(score.get("score") or 0),
+            int(score.get("level") or 1), int(score.get("lines") or 0), str(score.get("date") or ""))
+
+
+def load_json_scores(path):
+    """
+    Read the scores from a scores.json file.
+
+    Args:
+        path: File holding {"highScores": [...]} or a plain list
+
+    Returns:
+        list: Score objects, empty if the file does not exist
+    """
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("highScores", []) if isinstance(data, dict) else data